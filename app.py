@@ -1,126 +1,224 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, render_template, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 import re
 import json
 import csv
 import io
+import logging
 import os
-from werkzeug.utils import secure_filename
-import PyPDF2
+import time
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from model_registry import warm_up
+from flashcard_core import FlashcardGenerator, PDFTooLargeError, iter_pdf_pages, iter_decoded_text
+from flashcard_cache import FlashcardCache
+from jobs import JobManager, InMemoryJobStore, SQLiteJobStore, QueueFullError
+from deck_store import InMemoryDeckStore, SQLiteDeckStore, InMemoryNamedDeckStore, SQLiteNamedDeckStore
+from selection import QuestionDeduplicator
+from metrics import metrics, format_server_timing
+from classification import DEFAULT_TAXONOMY_PATH
+from review import ReviewStore, DEFAULT_DUE_LIMIT, MAX_DUE_LIMIT, MAX_GRADE
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['X-Deck-Id', 'Server-Timing'])  # Enable CORS for all routes
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'txt', 'pdf'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# Initialize the text generation pipeline
-try:
-    # Use a smaller, more efficient model for Q&A generation
-    model_name = "google/flan-t5-base"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-    generator = pipeline("text2text-generation", model=model, tokenizer=tokenizer, max_length=512)
-    print(f"Model {model_name} loaded successfully!")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    # Fallback to a simpler approach
-    generator = None
+
+# Uploads are never saved to a folder: each file is buffered in memory and
+# only spills to an anonymous temporary file above UPLOAD_SPOOL_BYTES.
+# Requests larger than MAX_UPLOAD_MB are rejected with 413 before the body is read.
+# Form fields (such as pasted 'content') are held in memory, so they have their
+# own, smaller MAX_CONTENT_MB limit; Werkzeug's default would be 500 KB.
+MAX_UPLOAD_MB = float(os.environ.get('FLASHCARD_MAX_UPLOAD_MB', 64))
+MAX_CONTENT_MB = float(os.environ.get('FLASHCARD_MAX_CONTENT_MB', 16))
+UPLOAD_SPOOL_BYTES = int(os.environ.get('FLASHCARD_UPLOAD_SPOOL_BYTES', 4 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
+app.config['MAX_FORM_MEMORY_SIZE'] = int(MAX_CONTENT_MB * 1024 * 1024)
+
+class UploadRequest(Request):
+    """Request that buffers uploaded files in memory until they pass UPLOAD_SPOOL_BYTES"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='rb+')
+
+app.request_class = UploadRequest
+
+# PDF extraction: uploads with more pages than this (in the requested page
+# range) are rejected with 413; with PDF_WORKERS > 1, PDFs of 500+ pages are
+# parsed in a process pool
+MAX_PDF_PAGES = int(os.environ.get('FLASHCARD_MAX_PDF_PAGES', 1000))
+PDF_WORKERS = int(os.environ.get('FLASHCARD_PDF_WORKERS', 0))
+
+# Result cache: bounded LRU in memory, optionally persisted to SQLite so
+# re-uploaded documents skip the model even across restarts
+CACHE_MAX_ENTRIES = int(os.environ.get('FLASHCARD_CACHE_MAX_ENTRIES', 1024))
+CACHE_PATH = os.environ.get('FLASHCARD_CACHE_PATH')  # e.g. cache/flashcards.sqlite3
+# Greedy decoding makes cached results identical to what a fresh run would give
+DETERMINISTIC_DECODING = os.environ.get('FLASHCARD_DETERMINISTIC', '0') == '1'
+# Token choice: sample, greedy or beam (with NUM_BEAMS beams); unset follows FLASHCARD_DETERMINISTIC
+DECODING = os.environ.get('FLASHCARD_DECODING') or None
+NUM_BEAMS = int(os.environ.get('FLASHCARD_NUM_BEAMS', 2))
+# Question-answer decoding strategy: two_pass, single_pass or shared_encoder
+GENERATION_STRATEGY = os.environ.get('FLASHCARD_STRATEGY', 'two_pass')
+# Inference runtime: transformers (fp32), int8 (dynamic quantization) or onnx
+INFERENCE_BACKEND = os.environ.get('FLASHCARD_BACKEND', 'transformers')
+# JSON file mapping subjects to the keywords cards are classified by
+TAXONOMY_PATH = os.environ.get('FLASHCARD_TAXONOMY', DEFAULT_TAXONOMY_PATH)
+
+# Decks with fewer than MIN_CARDS generated cards are topped up with fallback
+# cards to TOP_UP_CARDS; streamed decks take those from the first
+# FALLBACK_SOURCE_CHARS characters of the document
+MIN_CARDS = 5
+TOP_UP_CARDS = 10
+FALLBACK_SOURCE_CHARS = 20000
+
+# Use a smaller, more efficient model for Q&A generation. The pipeline is
+# loaded on first use from the shared model registry, not at import time.
+MODEL_NAME = "google/flan-t5-base"
+
+# Prompts from concurrent requests are merged into batches of up to
+# MAX_BATCH_SIZE, waiting at most BATCH_WAIT_MS for a batch to fill
+# (a negative wait turns request batching off)
+BATCH_WAIT_MS = float(os.environ.get('FLASHCARD_BATCH_WAIT_MS', 20))
+MAX_BATCH_SIZE = int(os.environ.get('FLASHCARD_MAX_BATCH_SIZE', 16))
+
+# Background jobs: generation runs on a bounded worker pool; submissions beyond
+# JOB_QUEUE_SIZE waiting jobs are rejected with 429
+JOB_WORKERS = int(os.environ.get('FLASHCARD_JOB_WORKERS', 2))
+JOB_QUEUE_SIZE = int(os.environ.get('FLASHCARD_JOB_QUEUE_SIZE', 8))
+# Set FLASHCARD_JOB_STORE_PATH to keep job records in SQLite, so any worker
+# process can report on or cancel a job
+JOB_STORE_PATH = os.environ.get('FLASHCARD_JOB_STORE_PATH')  # e.g. data/jobs.sqlite3
+
+# Generated decks are kept server-side for DECK_TTL_SECONDS and exported by id;
+# set FLASHCARD_DECK_STORE_PATH to keep them in SQLite instead of memory (where
+# at most MAX_DECKS_IN_MEMORY decks, and as many named decks, are kept)
+DECK_TTL_SECONDS = int(os.environ.get('FLASHCARD_DECK_TTL_SECONDS', 24 * 3600))
+DECK_STORE_PATH = os.environ.get('FLASHCARD_DECK_STORE_PATH')  # e.g. data/decks.sqlite3
+MAX_DECKS_IN_MEMORY = int(os.environ.get('FLASHCARD_MAX_DECKS', 1000))
+# Named decks are updated incrementally when a new version of their document is
+# uploaded; set FLASHCARD_NAMED_DECKS_PATH to keep them in SQLite
+NAMED_DECKS_PATH = os.environ.get('FLASHCARD_NAMED_DECKS_PATH')  # e.g. data/named_decks.sqlite3
+# Cards under spaced-repetition review, with their SM-2 state, in SQLite; the
+# default ':memory:' keeps them in this process only
+REVIEW_DB_PATH = os.environ.get('FLASHCARD_REVIEW_DB_PATH', ':memory:')  # e.g. data/reviews.sqlite3
+
+# Set FLASHCARD_METRICS_DIR to have forked workers publish their metrics
+# there, so /metrics reports the sum over all workers whichever one answers
+METRICS_DIR = os.environ.get('FLASHCARD_METRICS_DIR')  # e.g. data/metrics
+
+flashcard_cache = FlashcardCache(max_entries=CACHE_MAX_ENTRIES, path=CACHE_PATH)
+card_generator = FlashcardGenerator(
+    MODEL_NAME,
+    cache=flashcard_cache,
+    deterministic=DETERMINISTIC_DECODING,
+    decoding=DECODING,
+    num_beams=NUM_BEAMS,
+    strategy=GENERATION_STRATEGY,
+    backend=INFERENCE_BACKEND,
+    batch_wait_ms=BATCH_WAIT_MS if BATCH_WAIT_MS >= 0 else None,
+    max_batch_size=MAX_BATCH_SIZE,
+    taxonomy_path=TAXONOMY_PATH
+)
+job_store = SQLiteJobStore(JOB_STORE_PATH) if JOB_STORE_PATH else InMemoryJobStore()
+job_manager = JobManager(job_store, max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE)
+if DECK_STORE_PATH:
+    deck_store = SQLiteDeckStore(DECK_STORE_PATH, ttl_seconds=DECK_TTL_SECONDS)
+else:
+    deck_store = InMemoryDeckStore(max_decks=MAX_DECKS_IN_MEMORY, ttl_seconds=DECK_TTL_SECONDS)
+if NAMED_DECKS_PATH:
+    named_decks = SQLiteNamedDeckStore(NAMED_DECKS_PATH)
+else:
+    named_decks = InMemoryNamedDeckStore(max_decks=MAX_DECKS_IN_MEMORY)
+review_store = ReviewStore(REVIEW_DB_PATH)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
-    try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        print(f"Error extracting PDF: {e}")
-        return ""
-
-def split_into_chunks(text, max_chunk_size=500):
-    """Split text into smaller chunks for processing"""
-    sentences = re.split(r'[.!?]+', text)
-    chunks = []
-    current_chunk = ""
+def generate_flashcards_from_text(text, num_cards=15, batch_size=8, on_progress=None):
+    """Generate flashcards from input text using LLM
     
-    for sentence in sentences:
-        if len(current_chunk + sentence) < max_chunk_size:
-            current_chunk += sentence + ". "
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
-    
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
-def generate_flashcards_from_text(text, num_cards=15):
-    """Generate flashcards from input text using LLM"""
-    if not generator:
+    If on_progress is given it is called as on_progress(done, total, new_cards)
+    after every batch of chunks.
+    """
+    if not card_generator.generator:
         # Fallback method without LLM
+        metrics.inc("flashcard_fallbacks_total", reason="no_model")
         return generate_fallback_flashcards(text)
     
+    cache_key = card_generator.document_cache_key(text, num_cards, variant="web")
+    cached = flashcard_cache.get_document(cache_key)
+    if cached is not None:
+        if on_progress:
+            on_progress(1, 1, cached)
+        return cached
+    
+    start = time.perf_counter()
     flashcards = []
-    chunks = split_into_chunks(text, 400)
+    # Decks with fallback cards (a failed generation, or top-up filler) aren't
+    # cached, so the same document gets model cards once the model recovers
+    has_fallbacks = False
+    seen_questions = QuestionDeduplicator()
+    # Token-aware chunks spread over the document, skipping very short and
+    # near-duplicate ones
+    selected = card_generator.select_chunks(text, num_cards)
     
-    for i, chunk in enumerate(chunks[:num_cards]):
-        if len(chunk.strip()) < 50:  # Skip very short chunks
-            continue
-            
-        try:
-            # Generate question
-            question_prompt = f"Generate a clear, specific question about this text: {chunk}"
-            question_result = generator(question_prompt, max_length=100, do_sample=True, temperature=0.7)
-            question = question_result[0]['generated_text'].strip()
-            
-            # Generate answer
-            answer_prompt = f"Answer this question based on the text: {question}\n\nText: {chunk}"
-            answer_result = generator(answer_prompt, max_length=200, do_sample=True, temperature=0.7)
-            answer = answer_result[0]['generated_text'].strip()
-            
-            # Clean up the generated text
-            question = re.sub(r'^(Question:|Q:)\s*', '', question, flags=re.IGNORECASE)
-            answer = re.sub(r'^(Answer:|A:)\s*', '', answer, flags=re.IGNORECASE)
-            
-            if question and answer and len(question) > 10 and len(answer) > 10:
-                flashcards.append({
-                    "question": question,
-                    "answer": answer,
-                    "difficulty": "Medium",  # Default difficulty
-                    "topic": f"Section {i+1}"
-                })
-                
-        except Exception as e:
-            print(f"Error generating flashcard {i}: {e}")
-            continue
+    for batch_start in range(0, len(selected), batch_size):
+        batch = selected[batch_start:batch_start + batch_size]
+        
+        # Generate the batch's questions, then its answers, as padded batches;
+        # chunks seen before are served from the cache
+        # (questions that are degenerate or repeat an earlier card aren't answered)
+        qa_pairs = card_generator.generate_question_answer_pairs([chunk for _, chunk in batch], batch_size,
+                                                                 seen_questions)
+        has_fallbacks = has_fallbacks or any(qa_pair.get("fallback") for qa_pair in qa_pairs)
+        
+        # Short and duplicate pairs are dropped; the rest are classified by
+        # topic and difficulty in one pass
+        new_cards = card_generator.build_flashcards(qa_pairs, batch, seen_questions)
+        
+        flashcards.extend(new_cards)
+        if on_progress:
+            on_progress(batch_start + len(batch), len(selected), new_cards)
     
     # If we don't have enough cards, add some fallback ones
-    if len(flashcards) < 5:
-        fallback_cards = generate_fallback_flashcards(text)
-        flashcards.extend(fallback_cards[:10-len(flashcards)])
+    filler = top_up_cards(text, len(flashcards))
+    flashcards.extend(filler)
     
+    if not (has_fallbacks or filler):
+        flashcard_cache.put_document(cache_key, flashcards, time.perf_counter() - start)
+    return flashcards
+
+def top_up_cards(text, count):
+    """Fallback cards to add to a deck of count generated cards (none if it has enough)"""
+    if count >= MIN_CARDS:
+        return []
+    metrics.inc("flashcard_fallbacks_total", reason="too_few_cards")
+    return generate_fallback_flashcards(text)[:TOP_UP_CARDS - count]
+
+def generate_deck_from_text(text, deck_id, on_progress=None):
+    """Generate flashcards for a background job and store them in the given deck"""
+    flashcards = generate_flashcards_from_text(text, on_progress=on_progress)
+    deck_store.add_cards(deck_id, flashcards)
     return flashcards
 
 def generate_fallback_flashcards(text):
-    """Generate basic flashcards without LLM as fallback"""
+    """Generate basic flashcards without LLM as fallback, classified like model cards"""
+    with metrics.time("fallback"):
+        items = _fallback_items(text)
+    return card_generator.make_flashcards(items)
+
+def _fallback_items(text):
+    """(qa_pair, sentence, index) items of fill-in-the-blank cards from the text's longer sentences"""
     sentences = re.split(r'[.!?]+', text)
     important_sentences = [s.strip() for s in sentences if len(s.strip()) > 50][:10]
     
-    flashcards = []
+    items = []
     for i, sentence in enumerate(important_sentences):
         # Create simple question-answer pairs
         words = sentence.split()
@@ -130,105 +228,523 @@ def generate_fallback_flashcards(text):
             question = sentence.replace(key_word, "______", 1)
             answer = key_word
             
-            flashcards.append({
+            items.append(({
                 "question": f"Fill in the blank: {question}",
-                "answer": answer,
-                "difficulty": "Easy",
-                "topic": f"Section {i+1}"
-            })
+                "answer": answer
+            }, sentence, i))
     
-    return flashcards
+    return items
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.timings = None
+    # timings=1 adds a per-stage breakdown to the response (Server-Timing header,
+    # or the 'done' event of an SSE stream). Reading it parses the form, which
+    # is when an upload is received into its buffer.
+    timings = metrics.collect_timings()
+    if request.method in ('POST', 'PUT'):
+        with metrics.time("upload_receive"):
+            wanted = request.values.get('timings') == '1'
+    else:
+        wanted = request.values.get('timings') == '1'
+    if wanted:
+        g.timings = timings
+    else:
+        metrics.stop_timings()
+
+@app.after_request
+def record_request_metrics(response):
+    seconds = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or "unknown"
+    metrics.observe("flashcard_http_request_seconds", seconds, endpoint=endpoint)
+    metrics.inc("flashcard_http_requests_total", endpoint=endpoint, status=response.status_code)
+    if g.timings is not None and not response.is_streamed:
+        response.headers['Server-Timing'] = format_server_timing({**g.timings, "total": seconds})
+    return response
+
+@app.errorhandler(PDFTooLargeError)
+def pdf_too_large(e):
+    return jsonify({"error": str(e)}), 413
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    # Werkzeug raises the same error for both limits; a request within the
+    # upload limit can only have hit the form field one
+    length = request.content_length
+    if length is not None and length <= app.config['MAX_CONTENT_LENGTH']:
+        error = f"A form field is larger than the {MAX_CONTENT_MB:g} MB limit"
+    elif length is not None:
+        error = f"Upload is larger than the {MAX_UPLOAD_MB:g} MB limit"
+    else:
+        error = f"Upload is larger than the {MAX_UPLOAD_MB:g} MB limit, or a form field than the {MAX_CONTENT_MB:g} MB one"
+    return jsonify({"error": error}), 413
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Per-stage timings and pipeline counters in the Prometheus text format"""
+    gauges = {"flashcard_job_queue_depth": ("Background jobs queued or running", job_manager.queue_depth())}
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def pdf_page_options():
+    """PDF page range (1-based, inclusive, from the request) and extraction limits"""
+    return {
+        "first_page": request.values.get('first_page', 1, type=int),
+        "last_page": request.values.get('last_page', None, type=int),
+        "max_pages": MAX_PDF_PAGES,
+        "workers": PDF_WORKERS
+    }
+
+def uploaded_file():
+    """Return the allowed uploaded file (a FileStorage backed by a spooled buffer), or None"""
+    file = request.files.get('file')
+    if file and file.filename != '' and allowed_file(file.filename):
+        return file
+    
+    return None
+
+def is_pdf(file):
+    return file.filename.lower().endswith('.pdf')
+
+def iter_upload_text(file):
+    """Text pieces of an uploaded file (PDF pages or decoded blocks), read as they are consumed"""
+    if is_pdf(file):
+        return iter_pdf_pages(file.stream, **pdf_page_options())
+    return iter_decoded_text(file.stream)
+
+def read_request_content():
+    """Return the text of the uploaded file or, if there is none or it holds no text, the 'content' form field
+    
+    Unreadable files are treated like empty ones; only page limit errors
+    (PDFTooLargeError) are raised.
+    """
+    file = uploaded_file()
+    if file:
+        try:
+            with metrics.time("pdf_extraction" if is_pdf(file) else "text_extraction"):
+                content = "".join(iter_upload_text(file))
+            if content.strip():
+                return content
+        except PDFTooLargeError:
+            raise
+        except Exception:
+            logger.exception("Error reading upload")
+    
+    return request.form.get('content', '')
+
+def detach_upload(file):
+    """Take an uploaded file's buffer away from the request and return it
+    
+    Werkzeug closes request.files when the request context ends, which may
+    be before a streamed response has been read, so a stream that reads the
+    upload must own its buffer and close it itself.
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+def iter_closing(pieces, stream):
+    """Yield from pieces, closing stream once they are exhausted or the iterator is closed"""
+    try:
+        yield from pieces
+    finally:
+        stream.close()
+
+def iter_request_content():
+    """Like read_request_content, but return an uploaded file as an iterator of text pieces
+    
+    The pieces up to the first one holding text are read before returning,
+    so empty or unreadable files fall back to the form field and limit
+    errors are raised here; the rest is read as the iterator is consumed.
+    The iterator owns the upload's buffer (see detach_upload) and closes it
+    when it ends or is closed.
+    """
+    file = uploaded_file()
+    if file:
+        # Extraction happens as the pieces are pulled, so it is timed per pull
+        pieces = metrics.time_iter(iter_upload_text(file), "pdf_extraction" if is_pdf(file) else "text_extraction")
+        leading = []
+        try:
+            for piece in pieces:
+                leading.append(piece)
+                if piece.strip():
+                    return iter_closing(chain(leading, pieces), detach_upload(file))
+        except PDFTooLargeError:
+            raise
+        except Exception:
+            logger.exception("Error reading upload")
+    
+    return request.form.get('content', '')
+
+def keep_opening(pieces, opening, limit=FALLBACK_SOURCE_CHARS):
+    """Yield text pieces, copying the first limit characters into the list opening"""
+    size = 0
+    for piece in pieces:
+        if size < limit:
+            opening.append(piece[:limit - size])
+            size += len(opening[-1])
+        yield piece
+
 @app.route('/generate_flashcards', methods=['POST'])
 def generate_flashcards():
     try:
-        content = ""
-        
-        # Check if file was uploaded
-        if 'file' in request.files:
-            file = request.files['file']
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                
-                if filename.lower().endswith('.pdf'):
-                    content = extract_text_from_pdf(file_path)
-                else:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                
-                # Clean up uploaded file
-                os.remove(file_path)
-        
-        # Check for text input
-        if not content and 'content' in request.form:
-            content = request.form['content']
+        content = read_request_content()
         
         if not content:
             return jsonify({"error": "No content provided"}), 400
         
+        # Job mode: queue the work and return a job id immediately
+        if request.values.get('async', '').lower() in ('1', 'true', 'yes'):
+            deck_id = deck_store.create()
+            try:
+                job_id = job_manager.submit(generate_deck_from_text, content, deck_id)
+            except QueueFullError as e:
+                deck_store.delete(deck_id)
+                return jsonify({"error": str(e)}), 429
+            
+            return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}", "deck_id": deck_id}), 202
+        
         # Generate flashcards
         flashcards = generate_flashcards_from_text(content)
         
         if not flashcards:
             return jsonify({"error": "Could not generate flashcards from the provided content"}), 400
         
-        return jsonify(flashcards)
+        response = jsonify(flashcards)
+        # The deck id lets the client export the deck without sending it back
+        response.headers['X-Deck-Id'] = deck_store.save(flashcards)
+        return response
+        
+    except (HTTPException, PDFTooLargeError):
+        raise
+    except Exception as e:
+        logger.exception("Error in generate_flashcards")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/generate_flashcards/stream', methods=['POST'])
+def stream_flashcards():
+    """Stream flashcards as each chunk is processed, as NDJSON or Server-Sent Events
+    
+    NDJSON (the default) sends one card per line. With format=sse or an
+    'Accept: text/event-stream' header each card is a 'data:' event, followed
+    by a final 'done' event carrying the card count and deck id. PDF uploads
+    are read page by page, so the first cards are sent while later pages are
+    unparsed. Cards are stored in a deck whose id is in the X-Deck-Id header.
+    """
+    try:
+        # The stream takes the upload's buffer from the request and closes it
+        # when it ends, so pages and text are read as generation asks for them
+        content = iter_request_content()
+    except (HTTPException, PDFTooLargeError):
+        raise
+    except Exception as e:
+        logger.exception("Error in stream_flashcards")
+        return jsonify({"error": str(e)}), 500
+    
+    if not content:
+        return jsonify({"error": "No content provided"}), 400
+    
+    use_sse = request.values.get('format') == 'sse' or \
+        request.accept_mimetypes.best == 'text/event-stream'
+    
+    deck_id = deck_store.create()
+    timings = g.timings
+    
+    def generate():
+        count = 0
+        if timings is not None:
+            metrics.collect_timings(timings)
+        # The opening text is kept for fallback cards, in case the deck is short
+        opening = [content] if isinstance(content, str) else []
+        pieces = content if isinstance(content, str) else keep_opening(content, opening)
+        
+        def send(card):
+            deck_store.add_cards(deck_id, [card])
+            if use_sse:
+                return f"data: {json.dumps(card)}\n\n"
+            return json.dumps(card) + "\n"
+        
+        try:
+            # Uploaded files arrive as pieces and get leading selection, so cards
+            # follow the pages as they are read; pasted text is covered in full
+            for card in card_generator.iter_flashcards(pieces):
+                count += 1
+                yield send(card)
+            # Like /generate_flashcards, top up short decks with fallback cards
+            for card in top_up_cards("".join(opening), count):
+                count += 1
+                yield send(card)
+        except Exception as e:
+            logger.exception("Error in stream_flashcards")
+            error = json.dumps({"error": str(e)})
+            yield f"event: error\ndata: {error}\n\n" if use_sse else error + "\n"
+            return
+        finally:
+            # Release the upload buffer, even if the client went away mid-stream
+            if not isinstance(content, str):
+                content.close()
+        
+        if use_sse:
+            done = {'count': count, 'deck_id': deck_id}
+            if timings is not None:
+                done['timings'] = timings
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                                 'X-Deck-Id': deck_id})
+    return response
+
+@app.route('/decks/<name>', methods=['POST', 'PUT'])
+def update_named_deck(name):
+    """Create or update a named deck from a new version of its document
+    
+    Only chunks that were added or changed since the previous version are
+    sent to the model; cards of unchanged chunks are kept.
+    """
+    try:
+        content = read_request_content()
+        if not content:
+            return jsonify({"error": "No content provided"}), 400
+        
+        entries, stats = card_generator.update_flashcards(content, named_decks.get(name))
+        if not entries:
+            # An empty deck couldn't be read back, so don't store one
+            return jsonify({"error": "Could not generate flashcards from the provided content"}), 400
+        
+        named_decks.put(name, entries)
+        flashcards = named_decks.cards(entries)
+        
+        response = jsonify({"name": name, "flashcards": flashcards, **stats})
+        response.headers['X-Deck-Id'] = deck_store.save(flashcards)
+        return response
         
+    except (HTTPException, PDFTooLargeError):
+        raise
     except Exception as e:
-        print(f"Error in generate_flashcards: {e}")
+        logger.exception("Error in update_named_deck")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/decks/<name>', methods=['GET'])
+def get_named_deck(name):
+    """Return the current cards of a named deck"""
+    entries = named_decks.get(name)
+    if entries is None:
+        return jsonify({"error": "Deck not found"}), 404
+    
+    return jsonify({"name": name, "flashcards": named_decks.cards(entries)})
+
+@app.route('/decks/<name>', methods=['DELETE'])
+def delete_named_deck(name):
+    """Forget a named deck"""
+    if not named_decks.delete(name):
+        return jsonify({"error": "Deck not found"}), 404
+    
+    return jsonify({"name": name, "deleted": True})
+
+def valid_review_card(card):
+    return (isinstance(card, dict) and isinstance(card.get('question'), str) and card['question'].strip()
+            and isinstance(card.get('answer'), str) and card['answer'].strip())
+
+@app.route('/reviews/<user_id>/cards', methods=['POST'])
+def add_review_cards(user_id):
+    """Start reviewing flashcards: a list of card dicts, or a stored deck by id
+    
+    All cards are inserted in one transaction; cards the user is already
+    reviewing are skipped.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {"flashcards": data}
+
+        deck = data.get('deck')
+        if data.get('deck_id'):
+            flashcards = deck_store.get(data['deck_id'])
+            if flashcards is None:
+                return jsonify({"error": "Deck not found"}), 404
+            deck = deck or data['deck_id']
+        else:
+            flashcards = data.get('flashcards')
+
+        if not isinstance(flashcards, list) or not flashcards:
+            return jsonify({"error": "No flashcards provided"}), 400
+        if deck is not None and not isinstance(deck, str):
+            return jsonify({"error": "deck must be a string"}), 400
+        if not all(valid_review_card(card) for card in flashcards):
+            return jsonify({"error": "Every flashcard needs a question and an answer"}), 400
+        
+        added = review_store.add_cards(user_id, flashcards, deck=deck)
+        return jsonify({"user_id": user_id, "added": added, "skipped": len(flashcards) - added})
+        
+    except Exception as e:
+        logger.exception("Error in add_review_cards")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/reviews/<user_id>/due')
+def due_review_cards(user_id):
+    """Return the user's next cards due for review, most overdue first"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_DUE_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = min(max(limit, 1), MAX_DUE_LIMIT)
+    
+    return jsonify({"user_id": user_id, "cards": review_store.due(user_id, limit)})
+
+@app.route('/reviews/<user_id>/cards/<int:card_id>', methods=['POST'])
+def review_card(user_id, card_id):
+    """Grade a review of a card (0-5) and reschedule it"""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object with a grade"}), 400
+    grade = data.get('grade', request.form.get('grade'))
+    try:
+        grade = int(grade)
+    except (TypeError, ValueError):
+        grade = -1
+    if not 0 <= grade <= MAX_GRADE:
+        return jsonify({"error": f"grade must be an integer from 0 to {MAX_GRADE}"}), 400
+    
+    card = review_store.review(user_id, card_id, grade)
+    if card is None:
+        return jsonify({"error": "Card not found"}), 404
+    
+    return jsonify(card)
+
+@app.route('/reviews/<user_id>/cards/<int:card_id>', methods=['DELETE'])
+def delete_review_card(user_id, card_id):
+    """Stop reviewing a card"""
+    if not review_store.delete(user_id, card_id):
+        return jsonify({"error": "Card not found"}), 404
+    
+    return jsonify({"id": card_id, "deleted": True})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report a generation job's status, progress and (partial) results"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running generation job"""
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job_manager.get(job_id))
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Report flashcard cache hit/miss counters and generation time saved"""
+    return jsonify(flashcard_cache.stats())
+
+def iter_csv_rows(flashcards):
+    """Yield a CSV export one row at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def take():
+        row = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return row
+    
+    writer.writerow(['Question', 'Answer', 'Difficulty', 'Topic'])
+    yield take()
+    
+    for card in flashcards:
+        writer.writerow([
+            card.get('question', ''),
+            card.get('answer', ''),
+            card.get('difficulty', 'Medium'),
+            card.get('topic', '')
+        ])
+        yield take()
+
+def iter_json_array(flashcards):
+    """Yield a JSON export (formatted like json.dumps(..., indent=2)) one card at a time"""
+    separator = "[\n  "
+    for card in flashcards:
+        yield separator + json.dumps(card, indent=2).replace("\n", "\n  ")
+        separator = ",\n  "
+    yield "[]" if separator.startswith("[") else "\n]"
+
+def export_response(format, flashcards):
+    """Stream flashcards as a CSV or JSON download"""
+    if format == 'csv':
+        rows, mimetype = iter_csv_rows(flashcards), 'text/csv'
+    elif format == 'json':
+        rows, mimetype = iter_json_array(flashcards), 'application/json'
+    else:
+        return jsonify({"error": "Unsupported export format"}), 400
+    
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=flashcards.{format}'}
+    )
+
+@app.route('/export/<format>/<deck_id>')
+def export_deck(format, deck_id):
+    """Export a stored deck in different formats"""
+    flashcards = deck_store.iter_cards(deck_id)
+    if flashcards is None:
+        return jsonify({"error": "Deck not found or expired"}), 404
+    
+    return export_response(format, flashcards)
+
 @app.route('/export/<format>')
 def export_flashcards(format):
-    """Export flashcards in different formats"""
+    """Export flashcards passed as URL-encoded JSON in ?data= (prefer /export/<format>/<deck_id>)"""
     flashcards_data = request.args.get('data')
     if not flashcards_data:
         return jsonify({"error": "No flashcard data provided"}), 400
     
     try:
         flashcards = json.loads(flashcards_data)
-        
-        if format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Question', 'Answer', 'Difficulty', 'Topic'])
-            
-            for card in flashcards:
-                writer.writerow([
-                    card.get('question', ''),
-                    card.get('answer', ''),
-                    card.get('difficulty', 'Medium'),
-                    card.get('topic', '')
-                ])
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode()),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name='flashcards.csv'
-            )
-        
-        elif format == 'json':
-            return send_file(
-                io.BytesIO(json.dumps(flashcards, indent=2).encode()),
-                mimetype='application/json',
-                as_attachment=True,
-                download_name='flashcards.json'
-            )
-        
-        else:
-            return jsonify({"error": "Unsupported export format"}), 400
-            
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    
+    return export_response(format, flashcards)
+
+def preload_model():
+    """Load the model without running it, so forked workers share its weights (see gunicorn.conf.py)"""
+    return bool(card_generator.generator)
+
+def init_worker():
+    """Set up a worker process forked after the app was imported: it needs its own database connections"""
+    for store in (flashcard_cache, job_store, deck_store, named_decks, review_store):
+        store.reconnect()
+    if METRICS_DIR:
+        metrics.share(METRICS_DIR)
+
+def process_local_stores():
+    """Settings of the stores that live in this process only, so workers can't share them"""
+    stores = {
+        'FLASHCARD_JOB_STORE_PATH': job_store,
+        'FLASHCARD_DECK_STORE_PATH': deck_store,
+        'FLASHCARD_NAMED_DECKS_PATH': named_decks,
+        'FLASHCARD_REVIEW_DB_PATH': review_store,
+    }
+    return [name for name, store in stores.items()
+            if not isinstance(store, SQLiteStore) or store.path == ':memory:']
 
 if __name__ == '__main__':
+    # Preload the model in the serving process (not the debug reloader's watcher)
+    # so the first request doesn't pay for it
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up(MODEL_NAME, INFERENCE_BACKEND)
+    logging.basicConfig(level=logging.INFO)
     app.run(host='0.0.0.0', port=5001, debug=True)
 
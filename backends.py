@@ -0,0 +1,87 @@
+"""
+Flashcard Generator - Inference Backends
+Loaders that build a text2text-generation pipeline on different CPU runtimes
+"""
+
+import os
+from typing import Any, Callable, Dict
+
+
+DEFAULT_BACKEND = "transformers"
+# Exported ONNX models are kept here so the (slow) export only happens once
+ONNX_CACHE_DIR = os.environ.get(
+    'FLASHCARD_ONNX_DIR',
+    os.path.join(os.path.expanduser("~"), ".cache", "flashcard_generator", "onnx")
+)
+
+BackendLoader = Callable[[str, Dict[str, Any]], Any]
+BACKENDS: Dict[str, BackendLoader] = {}
+
+
+def register_backend(name: str):
+    """Decorator registering a loader as backend name"""
+    def decorator(loader: BackendLoader) -> BackendLoader:
+        BACKENDS[name] = loader
+        return loader
+    return decorator
+
+
+def load_pipeline(backend: str, model_name: str, settings: Dict[str, Any]):
+    """Build a text2text-generation pipeline for model_name on the given backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend](model_name, settings)
+
+
+@register_backend("transformers")
+def load_transformers(model_name: str, settings: Dict[str, Any]):
+    """Full-precision PyTorch model through the transformers pipeline"""
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer, **settings)
+
+
+@register_backend("int8")
+def load_int8(model_name: str, settings: Dict[str, Any]):
+    """PyTorch model with its Linear layers dynamically quantized to int8
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    roughly quarters the Linear weight memory and speeds up CPU matmuls.
+    """
+    import torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer, **settings)
+
+
+@register_backend("onnx")
+def load_onnx(model_name: str, settings: Dict[str, Any]):
+    """Model exported to ONNX and run with ONNX Runtime
+
+    Needs the optional optimum[onnxruntime] package. The export is saved under
+    ONNX_CACHE_DIR and reused on later loads.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("The onnx backend needs optimum[onnxruntime]: pip install 'optimum[onnxruntime]'") from e
+    from transformers import pipeline, AutoTokenizer
+
+    export_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        model = ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer, **settings)
+
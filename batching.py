@@ -0,0 +1,150 @@
+"""
+Flashcard Generator - Request Batching
+Merges generation calls from concurrent requests into shared model batches
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 20.0
+
+
+class _Call:
+    """One caller's prompts and the slots their results are written to"""
+
+    def __init__(self, size: int):
+        self.results: List[Any] = [None] * size
+        self.remaining = size
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingGenerator:
+    """Pipeline-compatible front end that micro-batches calls across threads
+
+    Prompts from every caller are queued, grouped by their generation
+    arguments (only calls with identical arguments can share a batch), and
+    run by a single scheduler thread in batches of up to max_batch_size. A
+    batch starts as soon as it is full, or once its oldest prompt has waited
+    max_wait_ms, so a lone request is delayed by at most max_wait_ms while
+    concurrent requests share the model's padded batches. Callers block
+    until their own results are ready and get them in the pipeline's format.
+    """
+
+    def __init__(self, generator, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+
+        self.generator = generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Generation arguments -> queued (enqueued_at, prompt, call, index) in arrival order
+        self._pending: Dict[Tuple, List[Tuple[float, str, _Call, int]]] = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.stats = {"batches": 0, "prompts": 0}
+
+    @property
+    def tokenizer(self):
+        return getattr(self.generator, "tokenizer", None)
+
+    @property
+    def model(self):
+        return getattr(self.generator, "model", None)
+
+    @property
+    def lock(self):
+        """The wrapped generator's lock, for code that uses the model directly"""
+        return self.generator.lock
+
+    def __call__(self, prompts, batch_size=None, **generation_kwargs):
+        """Queue prompts for the next matching batch and wait for their results"""
+        single = isinstance(prompts, str)
+        if single:
+            prompts = [prompts]
+        if not prompts:
+            return []
+
+        key = tuple(sorted(generation_kwargs.items()))
+        call = _Call(len(prompts))
+        now = time.perf_counter()
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchingGenerator is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="batching-generator", daemon=True)
+                self._thread.start()
+            self._pending.setdefault(key, []).extend((now, prompt, call, i) for i, prompt in enumerate(prompts))
+            self._condition.notify()
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.results[0] if single else call.results
+
+    def _next_batch(self):
+        """Wait for a batch to be ready and take it from the queue (holding the condition)"""
+        while True:
+            if not self._pending:
+                if self._closed:
+                    return None, None
+                self._condition.wait()
+                continue
+
+            # Serve the group whose oldest prompt has waited longest
+            key, items = min(self._pending.items(), key=lambda entry: entry[1][0][0])
+            wait = items[0][0] + self.max_wait - time.perf_counter()
+            if len(items) >= self.max_batch_size or wait <= 0 or self._closed:
+                batch = items[:self.max_batch_size]
+                if len(items) > len(batch):
+                    self._pending[key] = items[len(batch):]
+                else:
+                    del self._pending[key]
+                return key, batch
+
+            self._condition.wait(wait)
+
+    def _run(self):
+        """Scheduler loop: run batches until closed and drained"""
+        while True:
+            with self._condition:
+                key, batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                results = self.generator([prompt for _, prompt, _, _ in batch],
+                                         batch_size=len(batch), **dict(key))
+                error = None
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Generator returned {len(results)} results for {len(batch)} prompts")
+            except Exception as e:
+                results, error = [None] * len(batch), e
+
+            self.stats["batches"] += 1
+            self.stats["prompts"] += len(batch)
+            for (_, _, call, i), result in zip(batch, results):
+                if error is not None:
+                    call.error = error
+                call.results[i] = result
+                call.remaining -= 1
+                if call.remaining == 0:
+                    call.done.set()
+
+    def close(self):
+        """Stop accepting prompts; queued prompts are still run"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def mean_batch_size(self) -> float:
+        """Average number of prompts per model call so far"""
+        return self.stats["prompts"] / self.stats["batches"] if self.stats["batches"] else 0.0
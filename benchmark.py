@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the Flashcard Generator
+Measures throughput of the different code paths with sample content
+"""
+
+import argparse
+import difflib
+import io
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import sys
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backends import BACKENDS, register_backend
+from batching import BatchingGenerator
+from chunking import TokenChunker, tokenizer_token_counts
+from classification import CardClassifier
+from flashcard_core import FlashcardGenerator, STRATEGIES, extract_text_from_pdf, iter_chunks
+from model_registry import DEFAULT_MODEL_NAME, SharedGenerator
+from sample_content import BIOLOGY_SAMPLE, HISTORY_SAMPLE, COMPUTER_SCIENCE_SAMPLE
+
+
+SAMPLE_TEXT = "\n".join([BIOLOGY_SAMPLE, HISTORY_SAMPLE, COMPUTER_SCIENCE_SAMPLE])
+# Backends compared by default: the model backends, registered before the stub below
+MODEL_BACKENDS = list(BACKENDS)
+
+MB = 1024 * 1024
+# Corpus sizes for the regression suite. PDF extraction and the end-to-end
+# endpoint are much slower per byte, so they stop at smaller corpora.
+REGRESSION_SIZES = "1KB,64KB,1MB,10MB,50MB"
+SIZE_LIMITS = {"pdf_extraction": 5 * MB, "endpoint": 10 * MB}
+# Peak memory may grow by this much on top of the tolerance before it counts as a regression
+MEMORY_SLACK_MB = 1.0
+
+
+class StubPipeline:
+    """Stand-in for the text2text pipeline with no weights, for offline benchmarks
+
+    Outputs depend only on the prompt, so runs are reproducible: questions name
+    the two longest words of the text and answers are its first sentence. Each
+    call sleeps call_ms plus prompt_ms per prompt, modelling the fixed per-call
+    overhead that makes batched decoding cheaper per prompt.
+    """
+    tokenizer = None
+    model = None
+
+    def __init__(self, call_ms=50.0, prompt_ms=5.0):
+        self.call_ms = call_ms
+        self.prompt_ms = prompt_ms
+
+    def __call__(self, prompts, batch_size=None, **generation_kwargs):
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        time.sleep((self.call_ms + self.prompt_ms * len(prompts)) / 1000)
+        return [{"generated_text": self.generate(prompt)} for prompt in prompts]
+
+    @staticmethod
+    def generate(prompt):
+        text = prompt.rsplit("Text: ", 1)[1] if "Text: " in prompt else prompt.split(": ", 1)[-1]
+        sentence = re.split(r'(?<=[.!?])\s+', text.strip(), maxsplit=1)[0][:200]
+        terms = sorted(set(re.findall(r'[A-Za-z]{4,}', text)), key=lambda word: (-len(word), word))[:2]
+        question = f"What does the text say about {' and '.join(terms) or 'this topic'}?"
+
+        if prompt.startswith("Answer this question"):
+            return sentence
+        if "Question: ... Answer: ..." in prompt:
+            return f"Question: {question} Answer: {sentence}"
+        return question
+
+
+# The stub is only registered for benchmarks (and tests that import this
+# module), so production settings such as FLASHCARD_BACKEND can't select it
+@register_backend("stub")
+def load_stub(model_name, settings):
+    """Deterministic StubPipeline with the latency in the settings or FLASHCARD_STUB_CALL_MS/_PROMPT_MS"""
+    return StubPipeline(
+        settings.get("call_ms", float(os.environ.get('FLASHCARD_STUB_CALL_MS', 50))),
+        settings.get("prompt_ms", float(os.environ.get('FLASHCARD_STUB_PROMPT_MS', 5)))
+    )
+
+
+def time_runs(func, repeat):
+    """Call func repeat times and return (best wall time in seconds, last result)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark_batching(generator, text, num_cards, batch_size, repeat):
+    """Compare the per-chunk path with batched generation"""
+    print(f"\n⚡ Batched vs per-chunk generation ({len(generator.select_chunks(text, num_cards))} chunks)")
+    print("-" * 50)
+
+    runs = {
+        "per-chunk": lambda: generator.generate_flashcards(text, num_cards=num_cards),
+        f"batched (batch_size={batch_size})": lambda: generator.generate_flashcards_batch(
+            text, num_cards=num_cards, batch_size=batch_size
+        ),
+    }
+
+    for name, func in runs.items():
+        seconds, cards = time_runs(func, repeat)
+        rate = len(cards) / seconds if seconds else 0.0
+        print(f"{name:<28} {seconds:8.2f}s  {len(cards):3d} cards  {rate:6.2f} cards/s")
+
+
+def benchmark_strategies(text, num_cards, batch_size, repeat):
+    """Compare model calls, tokens and wall time per card for each decoding strategy"""
+    print("\n🧭 Question-answer decoding strategies (greedy decoding)")
+    print("-" * 50)
+    print(f"{'strategy':<16} {'calls/card':>10} {'tokens/card':>12} {'s/card':>8} {'cards':>6}")
+
+    for strategy in STRATEGIES:
+        generator = FlashcardGenerator(strategy=strategy, deterministic=True)
+        generator.reset_usage()
+        seconds, cards = time_runs(
+            lambda: generator.generate_flashcards_batch(text, num_cards=num_cards, batch_size=batch_size),
+            repeat
+        )
+        if not cards:
+            print(f"{strategy:<16} {'no cards':>10}")
+            continue
+
+        # Usage accumulates over all runs, so average it per run before per card
+        per_card = len(cards) * repeat
+        calls = generator.usage["model_calls"] / per_card
+        tokens = (generator.usage["input_tokens"] + generator.usage["output_tokens"]) / per_card
+        print(f"{strategy:<16} {calls:10.2f} {tokens:12.1f} {seconds / len(cards):8.3f} {len(cards):6d}")
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB (peak RSS where /proc isn't available)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def card_agreement(reference, cards):
+    """Share of identical questions and mean text similarity against reference cards"""
+    pairs = list(zip(reference, cards))
+    if not pairs:
+        return 0.0, 0.0
+    exact = sum(a["question"] == b["question"] for a, b in pairs) / len(pairs)
+    similarity = sum(
+        difflib.SequenceMatcher(None, a["question"] + " " + a["answer"], b["question"] + " " + b["answer"]).ratio()
+        for a, b in pairs
+    ) / len(pairs)
+    return exact, similarity
+
+
+def benchmark_backends(text, num_cards, batch_size, backends):
+    """Compare load time, memory, per-token latency and output agreement across backends
+
+    Backends are loaded one after another into the same process, so memory is
+    reported as the RSS increase for each load; run one backend per process
+    for isolated numbers.
+    """
+    print("\n🧮 Inference backends (greedy decoding, agreement vs the first backend)")
+    print("-" * 50)
+    print(f"{'backend':<14} {'load s':>7} {'+RSS MB':>8} {'ms/token':>9} {'s/card':>7} {'same Q':>7} {'similar':>8}")
+
+    reference = None
+    for backend in backends:
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        generator = FlashcardGenerator(backend=backend, deterministic=True)
+        generator.load_model()
+        load_seconds = time.perf_counter() - start
+        rss_added = current_rss_mb() - rss_before
+
+        if not generator.generator:
+            print(f"{backend:<14} {'unavailable':>7}")
+            continue
+
+        generator.reset_usage()
+        seconds, cards = time_runs(
+            lambda: generator.generate_flashcards_batch(text, num_cards=num_cards, batch_size=batch_size), 1
+        )
+        output_tokens = generator.usage["output_tokens"] or 1
+        if reference is None:
+            reference = cards
+        exact, similarity = card_agreement(reference, cards)
+
+        print(f"{backend:<14} {load_seconds:7.1f} {rss_added:8.0f} {seconds * 1000 / output_tokens:9.1f} "
+              f"{seconds / max(len(cards), 1):7.2f} {exact:7.0%} {similarity:8.0%}")
+
+
+def make_corpus(size_mb):
+    """Repeat the sample content until it is roughly size_mb megabytes"""
+    repeats = max(int(size_mb * 1024 * 1024 / len(SAMPLE_TEXT)), 1)
+    return SAMPLE_TEXT * repeats
+
+
+def benchmark_chunking(size_mb, repeat):
+    """Compare the character-based splitter with the token-aware chunker"""
+    text = make_corpus(size_mb)
+    pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    print(f"\n✂️  Chunking {len(text) / 1024 / 1024:.1f} MB")
+    print("-" * 50)
+
+    runs = {
+        "character split (400 chars)": lambda: list(iter_chunks([text], 400)),
+        "token chunker (estimated)": lambda: TokenChunker(max_tokens=100).split(text),
+        "token chunker (streamed pages)": lambda: list(TokenChunker(max_tokens=100).iter_chunks(pages)),
+    }
+
+    try:
+        from transformers import AutoTokenizer
+        count_tokens = tokenizer_token_counts(AutoTokenizer.from_pretrained(DEFAULT_MODEL_NAME))
+        runs["token chunker (tokenizer)"] = lambda: TokenChunker(max_tokens=100, count_tokens=count_tokens).split(text)
+    except Exception as e:
+        print(f"Skipping tokenizer run: {e}")
+
+    for name, func in runs.items():
+        seconds, chunks = time_runs(func, repeat)
+        rate = len(text) / 1024 / 1024 / seconds if seconds else 0.0
+        print(f"{name:<32} {seconds:8.2f}s  {len(chunks):7d} chunks  {rate:6.2f} MB/s")
+
+
+def percentile(values, fraction):
+    """The fraction-th percentile (nearest rank) of values"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def benchmark_serving(text, num_cards, batch_size, clients, requests, call_ms, prompt_ms,
+                      max_batch_size, max_wait_ms):
+    """Load-test concurrent clients against the stub model, with and without request batching"""
+    print(f"\n🚦 {clients} concurrent clients x {requests} requests "
+          f"(stub model: {call_ms:g} ms/call + {prompt_ms:g} ms/prompt)")
+    print("-" * 50)
+    print(f"{'mode':<26} {'cards/s':>8} {'p50 s':>7} {'p99 s':>7} {'prompts/call':>13}")
+    
+    modes = {
+        "per-request": lambda shared: shared,
+        f"batched (<= {max_batch_size}, {max_wait_ms:g} ms)": lambda shared: BatchingGenerator(
+            shared, max_batch_size, max_wait_ms
+        ),
+    }
+    
+    for name, make_front in modes.items():
+        front = make_front(SharedGenerator(StubPipeline(call_ms, prompt_ms), "stub"))
+        
+        generator = FlashcardGenerator(deterministic=True)
+        generator.generator = front
+        latencies, card_counts = [], []
+        
+        def client():
+            for _ in range(requests):
+                start = time.perf_counter()
+                cards = generator.generate_flashcards_batch(text, num_cards=num_cards, batch_size=batch_size)
+                latencies.append(time.perf_counter() - start)
+                card_counts.append(len(cards))
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            for future in [executor.submit(client) for _ in range(clients)]:
+                future.result()
+        seconds = time.perf_counter() - start
+        
+        prompts_per_call = generator.usage["prompts"] / generator.usage["model_calls"]
+        if isinstance(front, BatchingGenerator):
+            prompts_per_call = front.mean_batch_size()
+            front.close()
+        print(f"{name:<26} {sum(card_counts) / seconds:8.1f} {percentile(latencies, 0.5):7.2f} "
+              f"{percentile(latencies, 0.99):7.2f} {prompts_per_call:13.1f}")
+
+
+def parse_size(text):
+    """Parse a size such as 512, 64KB or 1.5MB into bytes"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMG]?)B?\s*', text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}")
+    return int(float(match.group(1)) * 1024 ** " KMG".index(match.group(2) or " "))
+
+
+def format_size(size_bytes):
+    for unit, scale in (("MB", MB), ("KB", 1024)):
+        if size_bytes >= scale:
+            return f"{size_bytes / scale:g}{unit}"
+    return f"{size_bytes}B"
+
+
+def synthetic_corpus(size_bytes, seed=0):
+    """About size_bytes of sample sentences in a seeded random order, in paragraphs
+
+    Shuffling (rather than repeating the samples) gives every chunk different
+    text, like a real document, while the same seed always gives the same corpus.
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', " ".join(SAMPLE_TEXT.split()))
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < size_bytes:
+        paragraph = " ".join(rng.choice(sentences) for _ in range(rng.randint(3, 8)))
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size_bytes]
+
+
+def make_pdf(text, chars_per_line=90, lines_per_page=50):
+    """Lay text out as a plain Helvetica PDF; returns (PDF bytes, page count)"""
+    lines = []
+    for paragraph in text.split("\n\n"):
+        words, line = paragraph.split(), ""
+        for word in words:
+            if line and len(line) + len(word) >= chars_per_line:
+                lines.append(line)
+                line = ""
+            line = f"{line} {word}" if line else word
+        lines.append(line)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td\n" + "".join(f"({escape(line)}) Tj T*\n" for line in page) + "ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(pages))
+
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    pdf.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return pdf.getvalue(), len(pages)
+
+
+def measure(func, repeat):
+    """Best wall time of repeat runs, the last result, and the peak traced memory (MB) of one more run
+
+    Memory is traced in a separate run because tracemalloc slows allocation-heavy code.
+    """
+    seconds, result = time_runs(func, repeat)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, result, peak / MB
+
+
+def load_app(call_ms, prompt_ms):
+    """Import the Flask app configured for offline benchmarking
+
+    The stub backend replaces the model, and request batching and persistent
+    stores are off so every request does the same work.
+    """
+    os.environ.update({
+        "FLASHCARD_BACKEND": "stub",
+        "FLASHCARD_STUB_CALL_MS": str(call_ms),
+        "FLASHCARD_STUB_PROMPT_MS": str(prompt_ms),
+        "FLASHCARD_BATCH_WAIT_MS": "-1",
+    })
+    for name in ("FLASHCARD_CACHE_PATH", "FLASHCARD_DECK_STORE_PATH", "FLASHCARD_NAMED_DECKS_PATH",
+                 "FLASHCARD_REVIEW_DB_PATH"):
+        os.environ.pop(name, None)
+    import app
+    return app
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_regression(sizes, repeat, call_ms, prompt_ms, seed=0):
+    """Time and trace memory of each pipeline stage on synthetic corpora of every size
+
+    Runs offline: the end-to-end endpoint uses the deterministic stub backend.
+    Returns the report that --json writes and --baseline compares.
+    """
+    print(f"\n📈 Regression suite (stub model: {call_ms:g} ms/call + {prompt_ms:g} ms/prompt)")
+    print("-" * 50)
+    print(f"{'benchmark':<16} {'size':>7} {'seconds':>9} {'items':>8} {'items/s':>11} {'MB/s':>8} {'peak MB':>8}")
+
+    flask_app = load_app(call_ms, prompt_ms)
+    client = flask_app.app.test_client()
+    generator = FlashcardGenerator()
+    classifier = CardClassifier.from_file()
+    results = []
+
+    def record(benchmark, size_bytes, func, unit, count=len):
+        seconds, result, peak_mb = measure(func, repeat)
+        items = count(result)
+        results.append({
+            "benchmark": benchmark,
+            "size_bytes": size_bytes,
+            "seconds": seconds,
+            "items": items,
+            "unit": unit,
+            "items_per_s": items / seconds if seconds else 0.0,
+            "mb_per_s": size_bytes / MB / seconds if seconds else 0.0,
+            "peak_mb": peak_mb,
+        })
+        print(f"{benchmark:<16} {format_size(size_bytes):>7} {seconds:9.4f} {items:8d} "
+              f"{results[-1]['items_per_s']:11.1f} {results[-1]['mb_per_s']:8.2f} {peak_mb:8.1f}")
+        return result
+
+    for size_bytes in sizes:
+        text = synthetic_corpus(size_bytes, seed)
+
+        chunks = record("chunking", size_bytes, lambda: TokenChunker(max_tokens=100).split(text), "chunks")
+
+        if size_bytes <= SIZE_LIMITS["pdf_extraction"]:
+            pdf, page_count = make_pdf(text)
+            record("pdf_extraction", size_bytes,
+                   lambda: extract_text_from_pdf(io.BytesIO(pdf), max_pages=page_count), "pages",
+                   count=lambda _: page_count)
+
+        pairs = record("fallback", size_bytes, lambda: [generator.generate_fallback_pair(chunk) for chunk in chunks], "cards")
+
+        questions = [pair["question"] for pair in pairs]
+        answers = [pair["answer"] for pair in pairs]
+        labels = record("classification", size_bytes,
+                        lambda: classifier.classify(chunks, questions, answers), "cards")
+
+        cards = [{"question": q, "answer": a, "difficulty": difficulty, "topic": topic}
+                 for q, a, (difficulty, topic) in zip(questions, answers, labels)]
+        deck_id = flask_app.deck_store.save(cards)
+        for format in ("csv", "json"):
+            record(f"export_{format}", size_bytes, lambda: client.get(f"/export/{format}/{deck_id}").data,
+                   "cards", count=lambda _: len(cards))
+        flask_app.deck_store.delete(deck_id)
+
+        if size_bytes <= SIZE_LIMITS["endpoint"]:
+            def request_deck():
+                flask_app.flashcard_cache.clear()  # every run must generate, not hit the cache
+                response = client.post("/generate_flashcards", content_type="multipart/form-data", data={
+                    "file": (io.BytesIO(text.encode()), "corpus.txt"),
+                })
+                return response.get_json() if response.status_code == 200 else []
+            record("endpoint", size_bytes, request_deck, "cards")
+
+    return {
+        "suite": "regression",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"sizes": sizes, "repeat": repeat, "seed": seed,
+                     "call_ms": call_ms, "prompt_ms": prompt_ms},
+        "rss_mb": current_rss_mb(),
+        "results": results,
+    }
+
+
+def compare_reports(report, baseline, tolerance):
+    """List results whose throughput fell, or peak memory grew, by more than tolerance vs baseline"""
+    previous = {(result["benchmark"], result["size_bytes"]): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        base = previous.get((result["benchmark"], result["size_bytes"]))
+        if base is None:
+            continue
+        name = f"{result['benchmark']} @ {format_size(result['size_bytes'])}"
+        if result["items_per_s"] < base["items_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['items_per_s']:.1f} {result['unit']}/s "
+                               f"(baseline {base['items_per_s']:.1f})")
+        if result["peak_mb"] > base["peak_mb"] * (1 + tolerance) + MEMORY_SLACK_MB:
+            regressions.append(f"{name}: peak {result['peak_mb']:.1f} MB (baseline {base['peak_mb']:.1f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flashcard generator")
+    parser.add_argument("suite", nargs="?", default="batching",
+                        choices=["batching", "chunking", "strategies", "backends", "serving", "regression"],
+                        help="which benchmark to run")
+    parser.add_argument("--num-cards", type=int, default=15, help="maximum cards per run")
+    parser.add_argument("--batch-size", type=int, default=8, help="batch size for batched generation")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path; the best time is reported")
+    parser.add_argument("--size-mb", type=float, default=4, help="corpus size for the chunking benchmark")
+    parser.add_argument("--backends", nargs="+", default=MODEL_BACKENDS, choices=MODEL_BACKENDS,
+                        help="backends to compare; the first is the agreement reference")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients for the serving benchmark")
+    parser.add_argument("--requests", type=int, default=5, help="requests per client for the serving benchmark")
+    parser.add_argument("--call-ms", type=float, default=50, help="stub model latency per call")
+    parser.add_argument("--prompt-ms", type=float, default=5, help="stub model latency per prompt")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="largest merged batch")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="longest wait for a batch to fill")
+    parser.add_argument("--sizes", default=REGRESSION_SIZES,
+                        type=lambda value: [parse_size(size) for size in value.split(",")],
+                        help="comma-separated corpus sizes for the regression suite")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic corpora")
+    parser.add_argument("--json", help="write the regression results to this JSON file")
+    parser.add_argument("--baseline", help="regression results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput drop / memory growth vs the baseline (fraction)")
+    args = parser.parse_args()
+
+    print("🏁 Benchmarking Flashcard Generator")
+    print("=" * 50)
+
+    if args.suite == "batching":
+        generator = FlashcardGenerator()
+        benchmark_batching(generator, SAMPLE_TEXT, args.num_cards, args.batch_size, args.repeat)
+    elif args.suite == "chunking":
+        benchmark_chunking(args.size_mb, args.repeat)
+    elif args.suite == "strategies":
+        benchmark_strategies(SAMPLE_TEXT, args.num_cards, args.batch_size, args.repeat)
+    elif args.suite == "backends":
+        benchmark_backends(SAMPLE_TEXT, args.num_cards, args.batch_size, args.backends)
+    elif args.suite == "serving":
+        benchmark_serving(SAMPLE_TEXT, args.num_cards, args.batch_size, args.clients, args.requests,
+                          args.call_ms, args.prompt_ms, args.max_batch_size, args.max_wait_ms)
+    elif args.suite == "regression":
+        report = benchmark_regression(args.sizes, args.repeat, args.call_ms, args.prompt_ms, args.seed)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {args.json}")
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                regressions = compare_reports(report, json.load(f), args.tolerance)
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline} (tolerance {args.tolerance:.0%})")
+            for regression in regressions:
+                print(f"  - {regression}")
+            if regressions:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Bulk generation for the Flashcard Generator
+Turns a directory of .txt/.pdf documents into flashcard decks
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backends import BACKENDS, DEFAULT_BACKEND
+from flashcard_core import FlashcardGenerator, DECODINGS, STRATEGIES, MAX_PDF_PAGES, iter_pdf_pages
+from model_registry import DEFAULT_MODEL_NAME
+from selection import QuestionDeduplicator
+
+
+DOCUMENT_EXTENSIONS = ('.txt', '.pdf')
+JSONL_FILENAME = "decks.jsonl"
+
+logger = logging.getLogger(__name__)
+
+
+def find_documents(input_dir: str) -> List[str]:
+    """Return the paths of all .txt/.pdf files under input_dir, relative to it and sorted"""
+    documents = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                documents.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return sorted(documents)
+
+
+def parse_document(path: str, max_pages: int = MAX_PDF_PAGES) -> str:
+    """Read the text of a .txt or .pdf file (runs in a worker process)
+
+    Unlike extract_text_from_pdf, unreadable PDFs raise instead of giving "",
+    so they are reported as failed and retried on the next run.
+    """
+    if path.lower().endswith('.pdf'):
+        return "".join(iter_pdf_pages(path, max_pages=max_pages))
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def iter_parsed(input_dir: str, documents: List[str], workers: int,
+                max_pages: int = MAX_PDF_PAGES) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+    """Yield (document, text, error) in order, parsing ahead in a process pool
+
+    At most two documents per worker are parsed ahead of the consumer, so
+    parsing overlaps inference without holding the whole corpus in memory.
+    """
+    if workers <= 1:
+        for document in documents:
+            try:
+                yield document, parse_document(os.path.join(input_dir, document), max_pages), None
+            except Exception as e:
+                yield document, None, e
+        return
+
+    remaining = iter(documents)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque(
+            (document, executor.submit(parse_document, os.path.join(input_dir, document), max_pages))
+            for document in islice(remaining, workers * 2)
+        )
+        while pending:
+            document, future = pending.popleft()
+            for next_document in islice(remaining, 1):
+                pending.append((next_document, executor.submit(
+                    parse_document, os.path.join(input_dir, next_document), max_pages
+                )))
+            try:
+                yield document, future.result(), None
+            except Exception as e:
+                yield document, None, e
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_decks(generator: FlashcardGenerator, documents: Iterable[Tuple[str, str]],
+               num_cards: int = 15, batch_size: int = 8) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yield (document, flashcards) for each (document, text), in input order
+
+    Selected chunks from consecutive documents are pooled into shared model
+    batches, so short documents still fill a batch.
+    """
+    pending = deque()  # decks waiting for some of their chunks, in input order
+    work = []  # (deck, chunk index, chunk) not yet sent to the model
+
+    def run(batch):
+        qa_pairs = generator.generate_question_answer_pairs([chunk for _, _, chunk in batch], batch_size)
+        kept = []
+        for (deck, i, chunk), qa_pair in zip(batch, qa_pairs):
+            if generator.keep_pair(qa_pair, deck["seen_questions"]):
+                kept.append((deck, (qa_pair, chunk, i)))
+            deck["remaining"] -= 1
+        # One classification pass for the whole batch, across documents
+        for (deck, _), flashcard in zip(kept, generator.make_flashcards([item for _, item in kept])):
+            deck["cards"].append(flashcard)
+
+    def finished():
+        while pending and pending[0]["remaining"] == 0:
+            deck = pending.popleft()
+            yield deck["document"], deck["cards"]
+
+    for document, text in documents:
+        selected = generator.select_chunks(text, num_cards)
+        deck = {"document": document, "cards": [], "remaining": len(selected),
+                "seen_questions": QuestionDeduplicator()}
+        pending.append(deck)
+        work.extend((deck, i, chunk) for i, chunk in selected)
+
+        while len(work) >= batch_size:
+            run(work[:batch_size])
+            work = work[batch_size:]
+        yield from finished()
+
+    if work:
+        run(work)
+    yield from finished()
+
+
+def deck_path(output_dir: str, document: str, output_format: str) -> str:
+    """Output path of a document's deck, mirroring the input directory layout
+
+    The document's extension is kept (notes.pdf -> notes.pdf.json) so notes.txt
+    and notes.pdf in the same folder get separate decks.
+    """
+    return os.path.join(output_dir, document + "." + output_format)
+
+
+def write_deck(path: str, flashcards: List[Dict[str, Any]], output_format: str):
+    """Write a deck as JSON or CSV, atomically so an interrupted run leaves no partial file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        if output_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(['Question', 'Answer', 'Difficulty', 'Topic'])
+            for card in flashcards:
+                writer.writerow([
+                    card.get('question', ''),
+                    card.get('answer', ''),
+                    card.get('difficulty', 'Medium'),
+                    card.get('topic', '')
+                ])
+        else:
+            json.dump(flashcards, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_finished_jsonl(path: str) -> Set[str]:
+    """Return the documents already in a combined JSONL file
+
+    A line cut short by a crash is truncated away so appending can resume.
+    """
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+
+    good_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                finished.add(json.loads(line)["source"])
+            except (ValueError, KeyError):
+                break
+            good_bytes += len(line)
+
+    if good_bytes < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good_bytes)
+    return finished
+
+
+def generate_directory(generator: FlashcardGenerator, input_dir: str, output_dir: str,
+                       output_format: str = 'json', num_cards: int = 15, batch_size: int = 8,
+                       workers: int = 1, max_pages: int = MAX_PDF_PAGES) -> Dict[str, Any]:
+    """Generate a deck for every document under input_dir, skipping finished ones
+
+    Returns counts of processed, skipped and failed files, cards and seconds.
+    """
+    start = time.perf_counter()
+    documents = find_documents(input_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jsonl_file = None
+    if output_format == 'jsonl':
+        jsonl_path = os.path.join(output_dir, JSONL_FILENAME)
+        finished = read_finished_jsonl(jsonl_path)
+        todo = [document for document in documents if document not in finished]
+        jsonl_file = open(jsonl_path, 'a', encoding='utf-8')
+    else:
+        todo = [document for document in documents
+                if not os.path.exists(deck_path(output_dir, document, output_format))]
+
+    stats = {"files": 0, "skipped": len(documents) - len(todo), "failed": 0, "cards": 0}
+
+    def parsed_texts():
+        for document, text, error in iter_parsed(input_dir, todo, workers, max_pages):
+            if error is not None:
+                # Failed files get no output, so the next run retries them
+                logger.error("Error reading %s: %s", document, error)
+                stats["failed"] += 1
+                continue
+            yield document, text
+
+    try:
+        for document, flashcards in iter_decks(generator, parsed_texts(), num_cards, batch_size):
+            if jsonl_file:
+                jsonl_file.write(json.dumps({"source": document, "flashcards": flashcards}) + "\n")
+                jsonl_file.flush()
+            else:
+                write_deck(deck_path(output_dir, document, output_format), flashcards, output_format)
+            stats["files"] += 1
+            stats["cards"] += len(flashcards)
+            print(f"✅ {document}: {len(flashcards)} cards")
+    finally:
+        if jsonl_file:
+            jsonl_file.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Generate flashcard decks for a directory of .txt/.pdf files")
+    parser.add_argument("input_dir", help="directory searched recursively for .txt and .pdf files")
+    parser.add_argument("output_dir", help="where decks are written; finished decks are skipped on rerun")
+    parser.add_argument("--format", dest="output_format", default="json", choices=["json", "csv", "jsonl"],
+                        help=f"one deck file per document, or a combined {JSONL_FILENAME}")
+    parser.add_argument("--num-cards", type=int, default=15, help="maximum cards per document")
+    parser.add_argument("--batch-size", type=int, default=8, help="chunks per model batch, across documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to parse documents")
+    parser.add_argument("--max-pdf-pages", type=int, default=MAX_PDF_PAGES, help="skip PDFs with more pages")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Hugging Face model name")
+    parser.add_argument("--strategy", default="two_pass", choices=STRATEGIES, help="question-answer decoding strategy")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS), help="inference backend")
+    parser.add_argument("--deterministic", action="store_true", help="use greedy decoding")
+    parser.add_argument("--decoding", choices=DECODINGS, help="token choice (overrides --deterministic)")
+    parser.add_argument("--num-beams", type=int, default=2, help="beams for --decoding beam")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"{args.input_dir} is not a directory")
+
+    print("📚 Bulk Flashcard Generation")
+    print("=" * 50)
+
+    generator = FlashcardGenerator(args.model, batch_size=args.batch_size, deterministic=args.deterministic,
+                                   decoding=args.decoding, num_beams=args.num_beams,
+                                   strategy=args.strategy, backend=args.backend)
+    stats = generate_directory(generator, args.input_dir, args.output_dir, args.output_format,
+                               args.num_cards, args.batch_size, args.workers, args.max_pdf_pages)
+
+    seconds = stats["seconds"] or 1e-9
+    print("-" * 50)
+    print(f"Processed {stats['files']} files ({stats['skipped']} already done, {stats['failed']} failed), "
+          f"{stats['cards']} cards in {stats['seconds']:.1f}s")
+    print(f"{stats['files'] / seconds:.2f} files/s  {stats['cards'] / seconds:.2f} cards/s")
+
+
+if __name__ == "__main__":
+    main()
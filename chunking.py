@@ -0,0 +1,196 @@
+"""
+Flashcard Generator - Chunking Engine
+Token-aware, single-pass text chunking for streamed input
+"""
+
+import math
+import re
+import threading
+import zlib
+from collections import deque
+from typing import Callable, Iterable, Iterator, List
+
+
+# A sentence ends at terminal punctuation followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# SentencePiece (T5) averages a little over one token per word or punctuation mark
+TOKENS_PER_WORD = 1.3
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+def approximate_token_counts(texts: List[str]) -> List[int]:
+    """Estimate token counts without a tokenizer"""
+    return [math.ceil(len(TOKEN_PATTERN.findall(text)) * TOKENS_PER_WORD) for text in texts]
+
+
+def tokenizer_token_counts(tokenizer) -> TokenCounter:
+    """Build a batched token counter from a Hugging Face tokenizer
+
+    Fast tokenizers fail when called from several threads at once, so calls
+    are serialized on the counter's own lock. Give it a tokenizer nothing
+    else calls (e.g. a copy of the model's) so counting never waits on, or
+    races with, generation.
+    """
+    lock = threading.Lock()
+
+    def count(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        with lock:
+            encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+    return count
+
+
+class TokenChunker:
+    """Split text into chunks of at most max_tokens tokenizer tokens
+
+    Chunks are built from whole sentences (keeping their punctuation) in a
+    single pass: sentences are counted once, in batches, and a chunk's text is
+    joined only when it is emitted, so cost is linear in the input size.
+    Sentences longer than max_tokens are split on word boundaries. The last
+    sentences of a chunk, up to overlap_tokens, are repeated at the start of
+    the next one.
+    """
+
+    def __init__(self, max_tokens: int = 128, overlap_tokens: int = 0,
+                 count_tokens: TokenCounter = approximate_token_counts):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be at least 0 and less than max_tokens")
+
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens
+
+    def split(self, text: str) -> List[str]:
+        """Split a complete text into chunks"""
+        return list(self.iter_chunks([text]))
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Chunk a stream of text pieces (e.g. PDF pages) as they arrive"""
+        current = deque()  # (sentence, tokens) pairs of the chunk being built
+        current_tokens = 0
+        has_new_text = False  # False while current only holds overlap
+
+        for sentences in self._iter_sentence_batches(pieces):
+            for sentence, tokens in self._fit_sentences(sentences):
+                if current_tokens + tokens > self.max_tokens and has_new_text:
+                    yield " ".join(sentence for sentence, _ in current)
+
+                    # Keep trailing sentences as overlap, leaving room for this one
+                    overlap_budget = min(self.overlap_tokens, self.max_tokens - tokens)
+                    while current and current_tokens > overlap_budget:
+                        current_tokens -= current.popleft()[1]
+                    has_new_text = False
+
+                current.append((sentence, tokens))
+                current_tokens += tokens
+                has_new_text = True
+
+        if has_new_text:
+            yield " ".join(sentence for sentence, _ in current)
+
+    def _iter_sentence_batches(self, pieces: Iterable[str]) -> Iterator[List[str]]:
+        """Yield lists of complete, whitespace-normalized sentences from the pieces
+
+        Text after the last sentence boundary of a piece is carried over as a
+        list of fragments (never re-concatenated per piece) until a later piece
+        completes it.
+        """
+        carry = []
+        for piece in pieces:
+            if not piece:
+                continue
+
+            # Include the previous fragment's last character so a boundary that
+            # straddles two pieces ("end." | " Next") is still found
+            tail = carry[-1][-1:] if carry else ""
+            probe = tail + piece
+            last_boundary = None
+            for last_boundary in SENTENCE_BOUNDARY.finditer(probe):
+                pass
+
+            if last_boundary is None:
+                carry.append(piece)
+                continue
+
+            cut = last_boundary.end() - len(tail)
+            complete = "".join(carry) + piece[:cut]
+            carry = [piece[cut:]] if cut < len(piece) else []
+            yield self._normalize(SENTENCE_BOUNDARY.split(complete))
+
+        if carry:
+            yield self._normalize(SENTENCE_BOUNDARY.split("".join(carry)))
+
+    @staticmethod
+    def _normalize(sentences: List[str]) -> List[str]:
+        normalized = (" ".join(sentence.split()) for sentence in sentences)
+        return [sentence for sentence in normalized if sentence]
+
+    def _fit_sentences(self, sentences: List[str]) -> Iterator:
+        """Yield (sentence, tokens) pairs, splitting sentences over max_tokens by words"""
+        if not sentences:
+            return
+
+        for sentence, tokens in zip(sentences, self.count_tokens(sentences)):
+            if tokens <= self.max_tokens:
+                yield sentence, tokens
+                continue
+
+            words = sentence.split()
+            window, window_tokens = [], 0
+            for word, word_tokens in zip(words, self.count_tokens(words)):
+                if window and window_tokens + word_tokens > self.max_tokens:
+                    yield " ".join(window), window_tokens
+                    window, window_tokens = [], 0
+                window.append(word)
+                window_tokens += word_tokens
+            if window:
+                yield " ".join(window), window_tokens
+
+
+class StableChunker(TokenChunker):
+    """Token-bounded chunker whose boundaries depend only on nearby text
+
+    TokenChunker packs sentences greedily, so inserting one sentence near the
+    start of a document shifts every later chunk boundary. Here a chunk ends
+    after a sentence whose hash is divisible by boundary_every (once the chunk
+    holds min_tokens), or when max_tokens would be exceeded. An edit then
+    changes only the chunks around it, and boundaries fall back into step at
+    the next hash-selected sentence, so unchanged text yields unchanged
+    chunks across document versions. Chunks average about boundary_every
+    sentences.
+    """
+
+    def __init__(self, max_tokens: int = 128, min_tokens: int = 0, boundary_every: int = 4,
+                 count_tokens: TokenCounter = approximate_token_counts):
+        super().__init__(max_tokens, 0, count_tokens)
+        if boundary_every <= 0:
+            raise ValueError("boundary_every must be positive")
+        self.min_tokens = min_tokens
+        self.boundary_every = boundary_every
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        current, current_tokens = [], 0
+
+        for sentences in self._iter_sentence_batches(pieces):
+            for sentence, tokens in self._fit_sentences(sentences):
+                if current and current_tokens + tokens > self.max_tokens:
+                    yield " ".join(current)
+                    current, current_tokens = [], 0
+
+                current.append(sentence)
+                current_tokens += tokens
+
+                if current_tokens >= self.min_tokens and \
+                        zlib.crc32(sentence.encode()) % self.boundary_every == 0:
+                    yield " ".join(current)
+                    current, current_tokens = [], 0
+
+        if current:
+            yield " ".join(current)
@@ -0,0 +1,140 @@
+"""
+Flashcard Generator - Card Classification
+Batched keyword topic detection and difficulty scoring over a configurable taxonomy
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from flashcard_cache import make_cache_key
+
+
+# Subjects and their keywords, in priority order for ties
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomy.json")
+
+# Used when the taxonomy file can't be read
+BASIC_TAXONOMY = {
+    "Science": ["experiment", "hypothesis", "theory", "research", "study", "analysis"],
+    "History": ["century", "war", "empire", "revolution", "ancient", "medieval"],
+    "Mathematics": ["equation", "formula", "calculate", "theorem", "proof", "variable"],
+}
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+# Endings a keyword may carry and still match (experiment -> experiments, experimented).
+# Endings that turn common words into other common words (base -> based, basic;
+# war -> ward) are left out; taxonomy.json lists such variants explicitly.
+SUFFIXES = ("", "s", "es", "ed", "ing", "ical", "ly", "ist", "ists", "ism")
+
+# Difficulty thresholds on question + answer length (characters) and on the
+# number of words longer than COMPLEX_WORD_LENGTH
+COMPLEX_WORD_LENGTH = 8
+EASY_MAX_LENGTH = 100
+EASY_MAX_COMPLEX_WORDS = 2
+HARD_MIN_LENGTH = 200
+HARD_MIN_COMPLEX_WORDS = 5
+
+
+def load_taxonomy(path: str = DEFAULT_TAXONOMY_PATH) -> Dict[str, List[str]]:
+    """Read a taxonomy file: a JSON object mapping each subject to its keywords"""
+    with open(path, 'r', encoding='utf-8') as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict) or not all(isinstance(words, list) for words in taxonomy.values()):
+        raise ValueError(f"{path} must map subject names to lists of keywords")
+    return taxonomy
+
+
+def _inflections(word: str) -> List[str]:
+    forms = [word + suffix for suffix in SUFFIXES]
+    if word.endswith("y"):
+        forms += [word[:-1] + "ies", word[:-1] + "ied", word[:-1] + "ical"]
+    if word.endswith("e"):
+        forms.append(word[:-1] + "ing")
+    return forms
+
+
+class CardClassifier:
+    """Assigns topics and difficulties to a batch of cards in one pass
+
+    Every keyword is expanded to its inflected forms up front and stored in
+    one dictionary from word (or word tuple, for multi-word keywords) to the
+    subjects it signals. Classifying a batch then takes one tokenization of
+    each card with a single compiled pattern and one dictionary lookup per
+    word (plus one per n-gram, for multi-word keywords), however large the
+    taxonomy. The long-word counts that drive difficulty are collected in the
+    same loop, and the scores of the whole batch are reduced with NumPy.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Sequence[str]]):
+        self.subjects = list(taxonomy)
+        # Identifies the taxonomy in cache keys, so edits invalidate cached decks
+        self.fingerprint = make_cache_key({subject: list(words) for subject, words in taxonomy.items()})
+        self._forms: Dict[object, Tuple[int, ...]] = {}
+        self._max_words = 1
+
+        for subject_id, keywords in enumerate(taxonomy.values()):
+            for keyword in keywords:
+                words = WORD_PATTERN.findall(keyword.lower())
+                if not words:
+                    continue
+                self._max_words = max(self._max_words, len(words))
+                for form in _inflections(words[-1]):
+                    key = form if len(words) == 1 else tuple(words[:-1]) + (form,)
+                    subjects = self._forms.get(key, ())
+                    if subject_id not in subjects:
+                        self._forms[key] = subjects + (subject_id,)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_TAXONOMY_PATH) -> "CardClassifier":
+        return cls(load_taxonomy(path))
+
+    def classify(self, chunks: List[str], questions: List[str], answers: List[str],
+                 indices: Optional[List[int]] = None) -> List[Tuple[str, str]]:
+        """Return (difficulty, topic) for each card
+
+        The topic is the subject with the most keyword hits in the card's
+        chunk (ties go to the subject listed first), or "Section <index + 1>"
+        if no keyword appears. Difficulty follows the question and answer
+        length and their number of long words.
+        """
+        n = len(chunks)
+        if n == 0:
+            return []
+        indices = list(range(n)) if indices is None else indices
+
+        hit_cards, hit_subjects = [], []
+        complex_words = np.zeros(n, dtype=np.int64)
+        forms, max_words = self._forms, self._max_words
+
+        for card in range(n):
+            words = WORD_PATTERN.findall(chunks[card].lower())
+            for i, word in enumerate(words):
+                for subject_id in forms.get(word, ()):
+                    hit_cards.append(card)
+                    hit_subjects.append(subject_id)
+                for size in range(2, min(max_words, len(words) - i) + 1):
+                    for subject_id in forms.get(tuple(words[i:i + size]), ()):
+                        hit_cards.append(card)
+                        hit_subjects.append(subject_id)
+
+            qa_words = WORD_PATTERN.findall(questions[card]) + WORD_PATTERN.findall(answers[card])
+            complex_words[card] = sum(len(word) > COMPLEX_WORD_LENGTH for word in qa_words)
+
+        scores = np.zeros((n, max(len(self.subjects), 1)), dtype=np.int64)
+        np.add.at(scores, (np.array(hit_cards, dtype=np.intp), np.array(hit_subjects, dtype=np.intp)), 1)
+        best = scores.argmax(axis=1)
+        has_topic = scores.max(axis=1) > 0
+
+        lengths = np.fromiter((len(q) + len(a) for q, a in zip(questions, answers)), dtype=np.int64, count=n)
+        easy = (lengths < EASY_MAX_LENGTH) & (complex_words < EASY_MAX_COMPLEX_WORDS)
+        hard = (lengths > HARD_MIN_LENGTH) | (complex_words > HARD_MIN_COMPLEX_WORDS)
+        difficulties = np.where(easy, "Easy", np.where(hard, "Hard", "Medium"))
+
+        return [
+            (str(difficulties[card]),
+             self.subjects[best[card]] if has_topic[card] else f"Section {indices[card] + 1}")
+            for card in range(n)
+        ]
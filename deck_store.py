@@ -0,0 +1,249 @@
+"""
+Flashcard Generator - Deck Store
+Server-side storage of generated decks, exported by id or kept by name for incremental updates
+"""
+
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlite_store import Reconnectable, SQLiteStore
+
+
+class DeckStore(Reconnectable, ABC):
+    """Storage interface for decks of flashcards, each kept for ttl_seconds"""
+
+    @abstractmethod
+    def create(self) -> str:
+        """Create an empty deck and return its id"""
+
+    @abstractmethod
+    def add_cards(self, deck_id: str, cards: List[Dict[str, Any]]):
+        """Append cards to a deck"""
+
+    @abstractmethod
+    def iter_cards(self, deck_id: str) -> Optional[Iterator[Dict[str, Any]]]:
+        """Iterate over a deck's cards in order, or return None if it doesn't exist or expired"""
+
+    @abstractmethod
+    def delete(self, deck_id: str):
+        """Remove a deck"""
+
+    def save(self, cards: List[Dict[str, Any]]) -> str:
+        """Store a complete deck and return its id"""
+        deck_id = self.create()
+        self.add_cards(deck_id, cards)
+        return deck_id
+
+    def get(self, deck_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return all cards of a deck, or None"""
+        cards = self.iter_cards(deck_id)
+        return list(cards) if cards is not None else None
+
+
+class InMemoryDeckStore(DeckStore):
+    """Bounded in-memory deck store; the oldest decks are evicted beyond max_decks"""
+
+    def __init__(self, max_decks: int = 1000, ttl_seconds: float = 24 * 3600):
+        self.max_decks = max_decks
+        self.ttl_seconds = ttl_seconds
+        self._decks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.time()
+        expired = [deck_id for deck_id, deck in self._decks.items() if deck["expires_at"] <= now]
+        for deck_id in expired:
+            del self._decks[deck_id]
+        while len(self._decks) > self.max_decks:
+            self._decks.popitem(last=False)
+
+    def create(self) -> str:
+        deck_id = uuid.uuid4().hex
+        with self._lock:
+            self._decks[deck_id] = {"expires_at": time.time() + self.ttl_seconds, "cards": []}
+            self._prune()
+        return deck_id
+
+    def add_cards(self, deck_id: str, cards: List[Dict[str, Any]]):
+        with self._lock:
+            deck = self._decks.get(deck_id)
+            if deck is not None:
+                deck["cards"].extend(cards)
+
+    def iter_cards(self, deck_id: str) -> Optional[Iterator[Dict[str, Any]]]:
+        with self._lock:
+            deck = self._decks.get(deck_id)
+            if deck is None or deck["expires_at"] <= time.time():
+                return None
+            # Snapshot the list so cards appended while exporting don't break iteration
+            return iter(list(deck["cards"]))
+
+    def delete(self, deck_id: str):
+        with self._lock:
+            self._decks.pop(deck_id, None)
+
+
+class SQLiteDeckStore(SQLiteStore, DeckStore):
+    """Deck store backed by SQLite, so decks survive restarts and are shared by workers
+
+    Cards are read back in pages, so exporting a large deck never holds it
+    all in memory.
+    """
+
+    PAGE_SIZE = 500
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS decks (id TEXT PRIMARY KEY, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS deck_cards ("
+        "deck_id TEXT NOT NULL, position INTEGER NOT NULL, card TEXT NOT NULL, "
+        "PRIMARY KEY (deck_id, position))",
+        "CREATE INDEX IF NOT EXISTS decks_expires_at ON decks (expires_at)",
+    )
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        super().__init__(path)
+
+    def _prune(self):
+        now = time.time()
+        self._conn.execute(
+            "DELETE FROM deck_cards WHERE deck_id IN (SELECT id FROM decks WHERE expires_at <= ?)", (now,)
+        )
+        self._conn.execute("DELETE FROM decks WHERE expires_at <= ?", (now,))
+
+    def create(self) -> str:
+        deck_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._prune()
+            self._conn.execute(
+                "INSERT INTO decks (id, expires_at) VALUES (?, ?)", (deck_id, time.time() + self.ttl_seconds)
+            )
+        return deck_id
+
+    def add_cards(self, deck_id: str, cards: List[Dict[str, Any]]):
+        if not cards:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(position), -1) FROM deck_cards WHERE deck_id = ?", (deck_id,)
+            ).fetchone()
+            start = row[0] + 1
+            self._conn.executemany(
+                "INSERT INTO deck_cards (deck_id, position, card) VALUES (?, ?, ?)",
+                [(deck_id, start + i, json.dumps(card)) for i, card in enumerate(cards)]
+            )
+
+    def iter_cards(self, deck_id: str) -> Optional[Iterator[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return self._iter_pages(deck_id)
+
+    def _iter_pages(self, deck_id: str) -> Iterator[Dict[str, Any]]:
+        position = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT position, card FROM deck_cards WHERE deck_id = ? AND position > ? "
+                    "ORDER BY position LIMIT ?",
+                    (deck_id, position, self.PAGE_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for position, card in rows:
+                yield json.loads(card)
+
+    def delete(self, deck_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM deck_cards WHERE deck_id = ?", (deck_id,))
+            self._conn.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
+
+
+class NamedDeckStore(Reconnectable, ABC):
+    """Storage for named decks kept per chunk, so a new version of a document can reuse cards
+
+    A named deck is a list of {"fingerprint": ..., "cards": [...]} entries in
+    document order, as returned by FlashcardGenerator.update_flashcards.
+    """
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a deck's chunk entries, or None if there is no deck by that name"""
+
+    @abstractmethod
+    def put(self, name: str, entries: List[Dict[str, Any]]):
+        """Replace a deck's chunk entries"""
+
+    @abstractmethod
+    def delete(self, name: str) -> bool:
+        """Remove a deck; returns False if it didn't exist"""
+
+    @staticmethod
+    def cards(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Flatten chunk entries into the deck's cards"""
+        return [card for entry in entries for card in entry["cards"]]
+
+
+class InMemoryNamedDeckStore(NamedDeckStore):
+    """Bounded in-memory named deck store; the least recently used decks are evicted beyond max_decks"""
+
+    def __init__(self, max_decks: int = 1000):
+        self.max_decks = max_decks
+        self._decks: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entries = self._decks.get(name)
+            if entries is not None:
+                self._decks.move_to_end(name)
+            # Like the SQLite store, a deck with no chunks reads as missing
+            return list(entries) if entries else None
+
+    def put(self, name: str, entries: List[Dict[str, Any]]):
+        with self._lock:
+            self._decks[name] = list(entries)
+            self._decks.move_to_end(name)
+            while len(self._decks) > self.max_decks:
+                self._decks.popitem(last=False)
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            return self._decks.pop(name, None) is not None
+
+
+class SQLiteNamedDeckStore(SQLiteStore, NamedDeckStore):
+    """Named decks in SQLite, one row per chunk, replaced in a single transaction"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS named_deck_chunks ("
+        "name TEXT NOT NULL, position INTEGER NOT NULL, fingerprint TEXT, cards TEXT NOT NULL, "
+        "PRIMARY KEY (name, position))",
+    )
+
+    def get(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fingerprint, cards FROM named_deck_chunks WHERE name = ? ORDER BY position", (name,)
+            ).fetchall()
+        if not rows:
+            return None
+        return [{"fingerprint": fingerprint, "cards": json.loads(cards)} for fingerprint, cards in rows]
+
+    def put(self, name: str, entries: List[Dict[str, Any]]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM named_deck_chunks WHERE name = ?", (name,))
+            self._conn.executemany(
+                "INSERT INTO named_deck_chunks (name, position, fingerprint, cards) VALUES (?, ?, ?, ?)",
+                [(name, i, entry["fingerprint"], json.dumps(entry["cards"])) for i, entry in enumerate(entries)]
+            )
+
+    def delete(self, name: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM named_deck_chunks WHERE name = ?", (name,))
+            return cursor.rowcount > 0
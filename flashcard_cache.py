@@ -0,0 +1,159 @@
+"""
+Flashcard Generator - Result Cache
+Content-addressed cache for generated question-answer pairs and whole decks
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlite_store import SQLiteStore
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash the given parts (text, prompts, model name, params...) into a cache key"""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory cache that evicts the least recently used entry"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheStore(SQLiteStore):
+    """On-disk key/value store backed by SQLite so cached results survive restarts"""
+
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)",)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Any):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                (key, json.dumps(value))
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FlashcardCache:
+    """Two-level (chunk and document) result cache with hit/miss counters
+
+    Entries live in a bounded LRU in memory and, if a path is given, are also
+    written through to SQLite. Each entry records how long it took to generate,
+    so hits can be reported as generation time saved.
+    """
+
+    LEVELS = ("chunk", "document")
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        self._memory = {level: LRUCache(max_entries) for level in self.LEVELS}
+        self._disk = SQLiteCacheStore(path) if path else None
+        self._lock = threading.Lock()
+        self._stats = {
+            level: {"hits": 0, "misses": 0, "seconds_saved": 0.0} for level in self.LEVELS
+        }
+
+    def _get(self, level: str, key: str) -> Optional[Any]:
+        entry = self._memory[level].get(key)
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(f"{level}:{key}")
+            if entry is not None:
+                self._memory[level].put(key, entry)
+
+        with self._lock:
+            stats = self._stats[level]
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            stats["hits"] += 1
+            stats["seconds_saved"] += entry["seconds"]
+
+        # Hand out a copy so callers can't mutate the cached value
+        return copy.deepcopy(entry["value"])
+
+    def _put(self, level: str, key: str, value: Any, seconds: float = 0.0):
+        entry = {"value": copy.deepcopy(value), "seconds": seconds}
+        self._memory[level].put(key, entry)
+        if self._disk is not None:
+            self._disk.put(f"{level}:{key}", entry)
+
+    def get_chunk(self, key: str) -> Optional[Dict[str, str]]:
+        """Look up a cached question-answer pair"""
+        return self._get("chunk", key)
+
+    def put_chunk(self, key: str, qa_pair: Dict[str, str], seconds: float = 0.0):
+        """Store a question-answer pair and the time it took to generate"""
+        self._put("chunk", key, qa_pair, seconds)
+
+    def get_document(self, key: str) -> Optional[Any]:
+        """Look up the cached flashcards for a whole document"""
+        return self._get("document", key)
+
+    def put_document(self, key: str, flashcards: Any, seconds: float = 0.0):
+        """Store the flashcards for a whole document and the time it took to generate"""
+        self._put("document", key, flashcards, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate, memory size and generation seconds saved per level"""
+        with self._lock:
+            result = {}
+            for level in self.LEVELS:
+                stats = dict(self._stats[level])
+                lookups = stats["hits"] + stats["misses"]
+                stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+                stats["entries_in_memory"] = len(self._memory[level])
+                result[level] = stats
+            result["persistent"] = self._disk is not None
+            return result
+
+    def clear(self):
+        """Drop every cached entry, in memory and on disk"""
+        for memory in self._memory.values():
+            memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def reconnect(self):
+        """Reopen the SQLite connection in a newly forked worker process"""
+        if self._disk is not None:
+            self._disk.reconnect()
@@ -3,93 +3,707 @@ Flashcard Generator - Core Module
 Contains the main logic for generating flashcards from educational content
 """
 
+import codecs
+import copy
+import logging
+import math
+import os
 import re
-from typing import List, Dict, Any
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable, Union, BinaryIO
+from chunking import StableChunker, TokenChunker, approximate_token_counts, tokenizer_token_counts
+from flashcard_cache import FlashcardCache, make_cache_key
+from selection import QuestionDeduplicator, select_representative
+from metrics import metrics
+from classification import BASIC_TAXONOMY, DEFAULT_TAXONOMY_PATH, CardClassifier
+from backends import BACKENDS, DEFAULT_BACKEND
+from model_registry import DEFAULT_MODEL_NAME, get_generator, get_batching_generator
+from batching import DEFAULT_MAX_BATCH_SIZE
 
+logger = logging.getLogger(__name__)
 
-class FlashcardGenerator:
-    """Main class for generating flashcards using LLM"""
+
+QUESTION_PROMPT = "Generate a clear, specific question about this text: {chunk}"
+ANSWER_PROMPT = "Answer this question based on the text: {question}\n\nText: {chunk}"
+QA_PROMPT = (
+    "Write one clear, specific question about this text and answer it, "
+    "in the form 'Question: ... Answer: ...'.\n\nText: {chunk}"
+)
+
+# How a question-answer pair is produced from a chunk:
+#   two_pass       - question decode, then answer decode with the chunk re-encoded
+#   single_pass    - one decode of a structured "Question: ... Answer: ..." output,
+#                    falling back to two_pass for outputs that can't be parsed
+#   shared_encoder - the chunk is encoded once and both decodes reuse the
+#                    encoder outputs (needs direct access to the model)
+STRATEGIES = ("two_pass", "single_pass", "shared_encoder")
+# How chunks are chosen when a document has more than num_cards: spread over
+# the whole document with near-duplicates dropped, or simply the first ones
+SELECTIONS = ("coverage", "leading")
+# How tokens are picked: sampling at temperature 0.7, greedy, or beam search
+DECODINGS = ("sample", "greedy", "beam")
+
+# Decode budgets in generated tokens, as (share of the chunk's tokens, cap):
+# a prompt may generate that share of its chunk, but at least
+# MIN_DECODE_TOKENS, rounded up to BUDGET_STEP so prompts about similar chunks
+# still share a batch, and never more than the cap
+QUESTION_BUDGET = (0.5, 100)
+ANSWER_BUDGET = (1.0, 200)
+QA_BUDGET = (1.5, 300)
+MIN_DECODE_TOKENS = 16
+BUDGET_STEP = 16
+
+# Generated questions end after their first stop sequence and answers before
+# theirs; stops that are a single vocabulary token also end the decode itself
+QUESTION_STOPS = ("?",)
+ANSWER_STOPS = ("Question:",)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Cards need a question and an answer longer than this (characters)
+MIN_CARD_TEXT = 10
+# A question of at least this many words that appears verbatim in its chunk is a copy
+COPY_MIN_WORDS = 8
+
+# Everything above that shapes the generated text, for cache keys
+DECODE_SETTINGS = (QUESTION_BUDGET, ANSWER_BUDGET, QA_BUDGET, MIN_DECODE_TOKENS, BUDGET_STEP,
+                   QUESTION_STOPS, ANSWER_STOPS, MIN_CARD_TEXT, COPY_MIN_WORDS)
+
+# FLAN-T5 encoder input limit
+MAX_INPUT_TOKENS = 512
+# Output tokens in the usage counters are estimated from this many outputs per model run
+USAGE_SAMPLE_SIZE = 16
+
+
+def generate_texts(generator, prompts: List[str], batch_size: int = 8, **generation_kwargs) -> List[str]:
+    """Run the generation pipeline over prompts in padded batches of batch_size"""
+    texts = []
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        results = generator(batch, batch_size=len(batch), **generation_kwargs)
+        for result in results:
+            # The pipeline nests outputs in a list when it can't flatten them
+            if isinstance(result, list):
+                result = result[0]
+            texts.append(result['generated_text'].strip())
+    return texts
+
+
+def decode_budget(chunk_tokens: int, budget: Tuple[float, int]) -> int:
+    """Generated-token limit for a prompt about a chunk of chunk_tokens tokens (see QUESTION_BUDGET)"""
+    share, cap = budget
+    tokens = max(math.ceil(chunk_tokens * share), MIN_DECODE_TOKENS)
+    return min(-(-tokens // BUDGET_STEP) * BUDGET_STEP, cap)
+
+
+def cut_at_stop(text: str, stops: Iterable[str], keep_stop: bool = False) -> str:
+    """Cut text at its earliest stop sequence, keeping the stop itself if keep_stop"""
+    found = [(text.find(stop), stop) for stop in stops if stop in text]
+    if not found:
+        return text
+    index, stop = min(found)
+    return text[:index + len(stop) if keep_stop else index].strip()
+
+
+def copies_chunk(question: str, chunk: str) -> bool:
+    """True if the question is just a run of COPY_MIN_WORDS or more words lifted from the chunk"""
+    words = WORD_PATTERN.findall(question.lower())
+    if len(words) < COPY_MIN_WORDS:
+        return False
+    chunk_words = WORD_PATTERN.findall(chunk.lower())
+    return f" {' '.join(words)} " in f" {' '.join(chunk_words)} "
+
+
+def clean_question(question: str) -> str:
+    """Strip a leading 'Question:' / 'Q:' label from generated text"""
+    return re.sub(r'^(Question:|Q:)\s*', '', question, flags=re.IGNORECASE)
+
+
+def clean_answer(answer: str) -> str:
+    """Strip a leading 'Answer:' / 'A:' label from generated text"""
+    return re.sub(r'^(Answer:|A:)\s*', '', answer, flags=re.IGNORECASE)
+
+
+QA_OUTPUT_PATTERN = re.compile(
+    r'^\s*\b(?:Question|Q)\s*:\s*(?P<question>.+?)\s*\b(?:Answer|A)\s*:\s*(?P<answer>.+?)\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def parse_qa_output(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Parse a single-pass "Question: ... Answer: ..." output into (question, answer)
     
-    def __init__(self, model_name: str = "google/flan-t5-base"):
-        """Initialize the flashcard generator with specified model"""
-        self.model_name = model_name
-        self.generator = None
-        self.load_model()
+    Without the labels, text up to the first '?' is taken as the question and
+    the rest as the answer. Parts that can't be recovered are returned as None.
+    """
+    match = QA_OUTPUT_PATTERN.match(text)
+    if match:
+        return match.group("question").strip(), match.group("answer").strip()
     
-    def load_model(self):
-        """Load the LLM model for text generation"""
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
-            self.generator = pipeline(
-                "text2text-generation", 
-                model=model, 
-                tokenizer=tokenizer, 
-                max_length=512
-            )
-            print(f"Model {self.model_name} loaded successfully!")
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            self.generator = None
+    if "?" in text:
+        question, _, rest = text.partition("?")
+        question = clean_question(question.strip()) + "?"
+        answer = clean_answer(rest.strip())
+        return question, answer or None
+    
+    return None, None
+
+
+def iter_chunks(pieces: Iterable[str], max_chunk_size: int = 500) -> Iterator[str]:
+    """Split a stream of text pieces into chunks of about max_chunk_size characters
+    
+    This is the original character-based splitting; FlashcardGenerator uses
+    the token-aware TokenChunker instead.
+    """
+    current_chunk = ""
+    carry = ""
+    pieces = iter(pieces)
+    finished = False
     
-    def split_into_chunks(self, text: str, max_chunk_size: int = 500) -> List[str]:
-        """Split text into smaller chunks for processing"""
-        sentences = re.split(r'[.!?]+', text)
-        chunks = []
-        current_chunk = ""
+    while not finished:
+        piece = next(pieces, None)
+        if piece is None:
+            sentences = [carry]
+            finished = True
+        else:
+            sentences = re.split(r'[.!?]+', carry + piece)
+            # The last sentence may continue in the next piece
+            carry = sentences.pop()
         
         for sentence in sentences:
             if len(current_chunk + sentence) < max_chunk_size:
                 current_chunk += sentence + ". "
             else:
                 if current_chunk:
-                    chunks.append(current_chunk.strip())
+                    yield current_chunk.strip()
                 current_chunk = sentence + ". "
+    
+    if current_chunk:
+        yield current_chunk.strip()
+
+
+class FlashcardGenerator:
+    """Main class for generating flashcards using LLM"""
+    
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 8,
+                 cache: Optional[FlashcardCache] = None, deterministic: bool = False,
+                 chunk_tokens: int = 100, chunk_overlap_tokens: int = 0,
+                 max_input_tokens: int = MAX_INPUT_TOKENS, strategy: str = "two_pass",
+                 backend: str = DEFAULT_BACKEND, batch_wait_ms: Optional[float] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, selection: str = "coverage",
+                 taxonomy_path: str = DEFAULT_TAXONOMY_PATH, decoding: Optional[str] = None,
+                 num_beams: int = 2):
+        """Initialize the flashcard generator with specified model
         
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        The model is loaded lazily from the shared model registry the first
+        time it is needed, so creating a generator is cheap.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown selection {selection!r}, expected one of {', '.join(SELECTIONS)}")
+        decoding = decoding or ("greedy" if deterministic else "sample")
+        if decoding not in DECODINGS:
+            raise ValueError(f"Unknown decoding {decoding!r}, expected one of {', '.join(DECODINGS)}")
+        
+        self.model_name = model_name
+        # How each question-answer pair is decoded (see STRATEGIES)
+        self.strategy = strategy
+        # Inference runtime the model is loaded on (see backends.BACKENDS)
+        self.backend = backend
+        # Which chunks get cards (see SELECTIONS)
+        self.selection = selection
+        self.batch_size = batch_size
+        # Reuses results for chunks and documents seen before; with
+        # deterministic=True decoding is greedy, so cached entries are exactly
+        # what a fresh run would produce
+        self.cache = cache
+        self.deterministic = deterministic
+        self.decoding = decoding
+        # Chunks hold up to chunk_tokens tokens (fewer if the prompts would not
+        # fit max_input_tokens) and repeat chunk_overlap_tokens of the previous one
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.max_input_tokens = max_input_tokens
+        # With batch_wait_ms set, model calls go through the process-wide
+        # BatchingGenerator, which merges prompts from concurrent callers into
+        # batches of up to max_batch_size, waiting at most batch_wait_ms
+        self.batch_wait_ms = batch_wait_ms
+        self.max_batch_size = max_batch_size
+        # Subjects and keywords cards are classified by (see classification.py)
+        self.taxonomy_path = taxonomy_path
+        self._classifier = None
+        self._generator = None
+        self._model_loaded = False
+        self._chunker = None
+        self._stable_chunker = None
+        self._prompt_overhead = {}
         
-        return chunks
+        # decoding overrides the sampling choice (see DECODINGS). Decode lengths
+        # are set per prompt from the *_BUDGET settings, and questions that are
+        # too short, copied or repeated skip the answer decode (_gate_questions)
+        if decoding == "sample":
+            sampling = {"do_sample": True, "temperature": 0.7}
+        elif decoding == "beam":
+            sampling = {"do_sample": False, "num_beams": num_beams, "early_stopping": True}
+        else:
+            sampling = {"do_sample": False}
+        self.question_kwargs = dict(sampling)
+        self.answer_kwargs = dict(sampling)
+        self.qa_kwargs = dict(sampling)
+        self._stop_token_ids = {}
+        
+        # Model usage counters: batched model invocations, prompts decoded and
+        # tokens in and out
+        self.usage = {"model_calls": 0, "prompts": 0, "input_tokens": 0, "output_tokens": 0}
+        self._usage_lock = threading.Lock()
+    
+    @property
+    def generator(self):
+        """The shared text generation pipeline, or None if the model failed to load"""
+        if not self._model_loaded:
+            self.load_model()
+        return self._generator
+    
+    @generator.setter
+    def generator(self, value):
+        self._generator = value
+        self._model_loaded = True
+    
+    def load_model(self):
+        """Load the LLM model for text generation from the shared model registry"""
+        if self.batch_wait_ms is not None:
+            self.generator = get_batching_generator(self.model_name, self.backend,
+                                                    self.max_batch_size, self.batch_wait_ms)
+        else:
+            self.generator = get_generator(self.model_name, self.backend)
+    
+    @property
+    def chunker(self) -> TokenChunker:
+        """Token-aware chunker sized so every prompt fits the model's input limit"""
+        if self._chunker is None:
+            tokenizer = getattr(self.generator, "tokenizer", None)
+            if tokenizer:
+                # Count with a private copy, so counting on request threads never
+                # touches the tokenizer the model is using on another thread
+                with getattr(self.generator, "lock", nullcontext()):
+                    tokenizer = copy.deepcopy(tokenizer)
+            count_tokens = tokenizer_token_counts(tokenizer) if tokenizer else approximate_token_counts
+            
+            # The answer prompt carries the chunk plus the generated question
+            question_overhead, answer_overhead, qa_overhead = count_tokens([
+                QUESTION_PROMPT.format(chunk=""),
+                ANSWER_PROMPT.format(question="", chunk=""),
+                QA_PROMPT.format(chunk="")
+            ])
+            # Prompt tokens are recorded as these plus the chunk's (and question's) tokens
+            self._prompt_overhead = {QUESTION_PROMPT: question_overhead, ANSWER_PROMPT: answer_overhead,
+                                     QA_PROMPT: qa_overhead}
+            overhead = max(question_overhead, answer_overhead + QUESTION_BUDGET[1])
+            budget = self.max_input_tokens - overhead - 1  # end-of-sequence token
+            
+            self._chunker = TokenChunker(
+                max_tokens=max(min(self.chunk_tokens, budget), 1),
+                overlap_tokens=self.chunk_overlap_tokens,
+                count_tokens=count_tokens
+            )
+        return self._chunker
     
-    def generate_question_answer_pair(self, chunk: str) -> Dict[str, str]:
-        """Generate a single question-answer pair from text chunk"""
+    @property
+    def stable_chunker(self) -> StableChunker:
+        """Chunker with edit-stable boundaries (for incremental decks), with the same token limit"""
+        if self._stable_chunker is None:
+            max_tokens = self.chunker.max_tokens
+            self._stable_chunker = StableChunker(
+                max_tokens=max_tokens,
+                min_tokens=max_tokens // 4,
+                count_tokens=self.chunker.count_tokens
+            )
+        return self._stable_chunker
+    
+    @property
+    def classifier(self) -> CardClassifier:
+        """Topic and difficulty classifier for the configured taxonomy"""
+        if self._classifier is None:
+            try:
+                self._classifier = CardClassifier.from_file(self.taxonomy_path)
+            except Exception:
+                logger.exception("Error loading taxonomy")
+                self._classifier = CardClassifier(BASIC_TAXONOMY)
+        return self._classifier
+    
+    def split_into_chunks(self, text: str, max_chunk_size: Optional[int] = None) -> List[str]:
+        """Split text into smaller chunks for processing
+        
+        Chunks are measured in tokenizer tokens by the token-aware chunker. The
+        old character-based splitting is used only when max_chunk_size (in
+        characters) is passed explicitly.
+        """
+        if max_chunk_size is not None:
+            return list(iter_chunks([text], max_chunk_size))
+        return self.chunker.split(text)
+    
+    def chunk_cache_key(self, chunk: str) -> str:
+        """Cache key for the question-answer pair of a chunk under the current settings"""
+        return make_cache_key(
+            "qa", chunk, self.strategy, QUESTION_PROMPT, ANSWER_PROMPT, QA_PROMPT,
+            self.model_name, self.backend, self.question_kwargs, self.answer_kwargs, self.qa_kwargs,
+            DECODE_SETTINGS
+        )
+    
+    def document_cache_key(self, text: str, num_cards: int, variant: str = "flashcards",
+                           selection: Optional[str] = None) -> str:
+        """Cache key for the flashcards of a whole document under the current settings"""
+        return make_cache_key(
+            variant, text, num_cards, self.strategy, QUESTION_PROMPT, ANSWER_PROMPT, QA_PROMPT,
+            self.model_name, self.backend, self.question_kwargs, self.answer_kwargs, self.qa_kwargs,
+            DECODE_SETTINGS, self.chunk_tokens, self.chunk_overlap_tokens, selection or self.selection,
+            self.classifier.fingerprint
+        )
+    
+    def generate_question_answer_pair(self, chunk: str,
+                                      seen_questions: Optional[QuestionDeduplicator] = None) -> Dict[str, str]:
+        """Generate a single question-answer pair from text chunk
+        
+        With seen_questions, a question repeating an earlier card's is not answered.
+        """
         if not self.generator:
+            metrics.inc("flashcard_fallbacks_total", reason="no_model")
             return self.generate_fallback_pair(chunk)
         
+        key = None
+        if self.cache is not None:
+            key = self.chunk_cache_key(chunk)
+            cached = self.cache.get_chunk(key)
+            if cached is not None:
+                return cached
+        
         try:
-            # Generate question
-            question_prompt = f"Generate a clear, specific question about this text: {chunk}"
-            question_result = self.generator(
-                question_prompt, 
-                max_length=100, 
-                do_sample=True, 
-                temperature=0.7
-            )
-            question = question_result[0]['generated_text'].strip()
+            start = time.perf_counter()
+            qa_pair = self._generate_pairs_with_model([chunk], 1, seen_questions)[0]
+            
+            if key and qa_pair.get("skipped") != "duplicate":
+                self.cache.put_chunk(key, qa_pair, time.perf_counter() - start)
             
-            # Generate answer
-            answer_prompt = f"Answer this question based on the text: {question}\n\nText: {chunk}"
-            answer_result = self.generator(
-                answer_prompt, 
-                max_length=200, 
-                do_sample=True, 
-                temperature=0.7
+            return qa_pair
+            
+        except Exception:
+            logger.exception("Error generating Q&A pair")
+            metrics.inc("flashcard_model_errors_total")
+            metrics.inc("flashcard_fallbacks_total", reason="model_error")
+            return self.generate_fallback_pair(chunk)
+    
+    def generate_question_answer_pairs(self, chunks: List[str], batch_size: Optional[int] = None,
+                                       seen_questions: Optional[QuestionDeduplicator] = None) -> List[Dict[str, str]]:
+        """Generate question-answer pairs for many chunks using batched model calls
+        
+        All question prompts are run first, then all answer prompts, each in
+        padded batches of batch_size, instead of two serial calls per chunk.
+        Chunks already in the cache are not sent to the model. With
+        seen_questions (the questions of the deck so far), questions repeating
+        an earlier card, or one earlier in the batch, are not answered.
+        """
+        if not self.generator:
+            metrics.inc("flashcard_fallbacks_total", len(chunks), reason="no_model")
+            return [self.generate_fallback_pair(chunk) for chunk in chunks]
+        
+        batch_size = batch_size or self.batch_size
+        qa_pairs = [None] * len(chunks)
+        keys = [None] * len(chunks)
+        
+        if self.cache is not None:
+            for j, chunk in enumerate(chunks):
+                keys[j] = self.chunk_cache_key(chunk)
+                qa_pairs[j] = self.cache.get_chunk(keys[j])
+        
+        missing = [j for j, qa_pair in enumerate(qa_pairs) if qa_pair is None]
+        if not missing:
+            return qa_pairs
+        
+        try:
+            start = time.perf_counter()
+            generated = self._generate_pairs_with_model([chunks[j] for j in missing], batch_size, seen_questions)
+            
+            seconds_per_chunk = (time.perf_counter() - start) / len(missing)
+            for j, qa_pair in zip(missing, generated):
+                qa_pairs[j] = qa_pair
+                # Whether a question is a duplicate depends on the deck, not the chunk
+                if keys[j] and qa_pair.get("skipped") != "duplicate":
+                    self.cache.put_chunk(keys[j], qa_pairs[j], seconds_per_chunk)
+            
+        except Exception:
+            logger.exception("Error generating batched Q&A pairs")
+            metrics.inc("flashcard_model_errors_total")
+            # Fall back to the per-chunk path so one bad batch doesn't lose the document
+            for j in missing:
+                qa_pairs[j] = self.generate_question_answer_pair(chunks[j], seen_questions)
+        
+        return qa_pairs
+    
+    def _run_model(self, prompts: List[str], batch_size: int, generation_kwargs: Dict[str, Any],
+                   stage: str, budgets: List[int], input_tokens: int, stops: Tuple[str, ...] = (),
+                   keep_stop: bool = False) -> List[str]:
+        """Run prompts through the generator in batches, timed as stage, and record usage
+        
+        Prompts are sorted by budget (their allowed number of generated
+        tokens) before batching, and each batch decodes up to the largest
+        budget in it, so short chunks don't wait on long budgets and the number
+        of model calls stays the same. Outputs are cut at the first of stops
+        (see cut_at_stop). input_tokens, the prompts' token count, is only
+        recorded in the usage counters.
+        """
+        order = sorted(range(len(prompts)), key=budgets.__getitem__)
+        outputs = [""] * len(prompts)
+        kwargs = {**generation_kwargs, **self._stop_kwargs(stops)}
+        with metrics.time(stage):
+            for start in range(0, len(order), batch_size):
+                indices = order[start:start + batch_size]
+                texts = generate_texts(self.generator, [prompts[j] for j in indices], batch_size,
+                                       max_length=budgets[indices[-1]], **kwargs)
+                for j, text in zip(indices, texts):
+                    outputs[j] = cut_at_stop(text, stops, keep_stop)
+        self._record_usage(-(-len(prompts) // batch_size), len(prompts), input_tokens,
+                           self._sample_token_count(outputs))
+        return outputs
+    
+    def _stop_kwargs(self, stops: Tuple[str, ...]) -> Dict[str, Any]:
+        """Generation arguments that end a decode at the stops that are single tokens"""
+        tokenizer = getattr(self.generator, "tokenizer", None)
+        if not stops or tokenizer is None or tokenizer.eos_token_id is None:
+            return {}
+        
+        if stops not in self._stop_token_ids:
+            with getattr(self.generator, "lock", nullcontext()):
+                ids = [tokenizer.convert_tokens_to_ids(stop) for stop in stops]
+            self._stop_token_ids[stops] = tuple(
+                token_id for token_id in ids
+                if isinstance(token_id, int) and token_id != tokenizer.unk_token_id
+            )
+        stop_ids = self._stop_token_ids[stops]
+        return {"eos_token_id": (tokenizer.eos_token_id, *stop_ids)} if stop_ids else {}
+    
+    @staticmethod
+    def _budgets(chunk_tokens: List[int], budget: Tuple[float, int]) -> List[int]:
+        return [decode_budget(tokens, budget) for tokens in chunk_tokens]
+    
+    def _prompt_tokens(self, template: str, chunk_tokens: List[int], extra_tokens: int = 0) -> int:
+        """Token count of template filled with chunks of chunk_tokens tokens, without tokenizing the prompts
+        
+        The chunks were counted for their decode budgets already, so this adds
+        the template's own tokens (and extra_tokens) to those counts. It can be
+        off by a token or so per prompt where the tokenizer merges across the
+        seam.
+        """
+        self.chunker  # sets _prompt_overhead
+        return self._prompt_overhead[template] * len(chunk_tokens) + sum(chunk_tokens) + extra_tokens
+    
+    def _sample_token_count(self, texts: List[str]) -> int:
+        """Token count of texts, estimated from up to USAGE_SAMPLE_SIZE of them spread over the list"""
+        if not texts:
+            return 0
+        sample = texts[::-(-len(texts) // USAGE_SAMPLE_SIZE)]
+        return round(sum(self.chunker.count_tokens(sample)) * len(texts) / len(sample))
+    
+    def _gate_questions(self, chunks: List[str], questions: List[str],
+                        seen_questions: Optional[QuestionDeduplicator] = None) -> List[Optional[str]]:
+        """Reason each question isn't worth answering (too_short, copy, duplicate), or None
+        
+        Duplicates are only looked for when seen_questions is given: against
+        its questions and those earlier in this batch.
+        """
+        batch_questions = QuestionDeduplicator() if seen_questions is not None else None
+        reasons = []
+        for question, chunk in zip(questions, chunks):
+            if len(question) <= MIN_CARD_TEXT:
+                reason = "too_short"
+            elif copies_chunk(question, chunk):
+                reason = "copy"
+            elif batch_questions is not None and (seen_questions.is_duplicate(question)
+                                                  or batch_questions.seen(question)):
+                reason = "duplicate"
+            else:
+                reason = None
+            if reason:
+                metrics.inc("flashcard_answer_decodes_skipped_total", reason=reason)
+            reasons.append(reason)
+        return reasons
+    
+    def _record_usage(self, model_calls: int, prompts: int, input_tokens: int, output_tokens: int):
+        with self._usage_lock:
+            self.usage["model_calls"] += model_calls
+            self.usage["prompts"] += prompts
+            self.usage["input_tokens"] += input_tokens
+            self.usage["output_tokens"] += output_tokens
+        
+        metrics.inc("flashcard_model_calls_total", model_calls)
+        metrics.inc("flashcard_prompts_total", prompts)
+        metrics.inc("flashcard_tokens_total", input_tokens, direction="in")
+        metrics.inc("flashcard_tokens_total", output_tokens, direction="out")
+    
+    def reset_usage(self):
+        """Zero the model usage counters"""
+        with self._usage_lock:
+            for name in self.usage:
+                self.usage[name] = 0
+    
+    def _generate_pairs_with_model(self, chunks: List[str], batch_size: int,
+                                   seen_questions: Optional[QuestionDeduplicator] = None) -> List[Dict[str, str]]:
+        """Generate question-answer pairs with the configured strategy; errors propagate
+        
+        Pairs whose answer decode was skipped carry the reason under "skipped".
+        """
+        if self.strategy == "single_pass":
+            return self._single_pass_pairs(chunks, batch_size, seen_questions)
+        model = getattr(self.generator, "model", None)
+        if self.strategy == "shared_encoder" and hasattr(model, "get_encoder"):
+            return [self._shared_encoder_pair(chunk, seen_questions) for chunk in chunks]
+        return self._two_pass_pairs(chunks, batch_size, seen_questions)
+    
+    def _two_pass_pairs(self, chunks: List[str], batch_size: int,
+                        seen_questions: Optional[QuestionDeduplicator] = None) -> List[Dict[str, str]]:
+        """Decode all questions, then answers for the questions worth answering"""
+        chunk_tokens = self.chunker.count_tokens(chunks)
+        question_prompts = [QUESTION_PROMPT.format(chunk=chunk) for chunk in chunks]
+        questions = self._run_model(question_prompts, batch_size, self.question_kwargs, "question_decode",
+                                    self._budgets(chunk_tokens, QUESTION_BUDGET),
+                                    self._prompt_tokens(QUESTION_PROMPT, chunk_tokens),
+                                    QUESTION_STOPS, keep_stop=True)
+        return self._answer_questions(chunks, questions, batch_size, seen_questions, chunk_tokens)
+    
+    def _answer_questions(self, chunks: List[str], questions: List[str], batch_size: int,
+                          seen_questions: Optional[QuestionDeduplicator] = None,
+                          chunk_tokens: Optional[List[int]] = None) -> List[Dict[str, str]]:
+        """Decode an answer for each (chunk, question) that passes _gate_questions
+        
+        chunk_tokens are the chunks' token counts, if the caller has them.
+        """
+        questions = [clean_question(question) for question in questions]
+        skipped = self._gate_questions(chunks, questions, seen_questions)
+        todo = [j for j, reason in enumerate(skipped) if reason is None]
+        
+        answers = [""] * len(chunks)
+        if todo:
+            chunk_tokens = chunk_tokens or self.chunker.count_tokens(chunks)
+            answer_prompts = [ANSWER_PROMPT.format(question=questions[j], chunk=chunks[j]) for j in todo]
+            todo_tokens = [chunk_tokens[j] for j in todo]
+            question_tokens = self._sample_token_count([questions[j] for j in todo])
+            outputs = self._run_model(answer_prompts, batch_size, self.answer_kwargs, "answer_decode",
+                                      self._budgets(todo_tokens, ANSWER_BUDGET),
+                                      self._prompt_tokens(ANSWER_PROMPT, todo_tokens, question_tokens),
+                                      ANSWER_STOPS)
+            for j, answer in zip(todo, outputs):
+                answers[j] = clean_answer(answer)
+        
+        qa_pairs = []
+        for question, answer, reason in zip(questions, answers, skipped):
+            qa_pair = {"question": question, "answer": answer}
+            if reason:
+                qa_pair["skipped"] = reason
+            qa_pairs.append(qa_pair)
+        return qa_pairs
+    
+    def _single_pass_pairs(self, chunks: List[str], batch_size: int,
+                           seen_questions: Optional[QuestionDeduplicator] = None) -> List[Dict[str, str]]:
+        """Decode question and answer together, falling back to two_pass where parsing fails"""
+        chunk_tokens = self.chunker.count_tokens(chunks)
+        outputs = self._run_model([QA_PROMPT.format(chunk=chunk) for chunk in chunks], batch_size,
+                                  self.qa_kwargs, "qa_decode", self._budgets(chunk_tokens, QA_BUDGET),
+                                  self._prompt_tokens(QA_PROMPT, chunk_tokens))
+        parsed = [parse_qa_output(output) for output in outputs]
+        qa_pairs = [
+            {"question": question, "answer": answer} if question and answer else None
+            for question, answer in parsed
+        ]
+        
+        # Outputs with no usable question get the full two-call path; outputs
+        # with only a question just need the answer call
+        no_question = [j for j, (question, _) in enumerate(parsed) if not question]
+        if no_question:
+            retried = self._two_pass_pairs([chunks[j] for j in no_question], batch_size, seen_questions)
+            for j, qa_pair in zip(no_question, retried):
+                qa_pairs[j] = qa_pair
+        
+        no_answer = [j for j, qa_pair in enumerate(qa_pairs) if qa_pair is None]
+        if no_answer:
+            answered = self._answer_questions(
+                [chunks[j] for j in no_answer], [parsed[j][0] for j in no_answer], batch_size, seen_questions,
+                [chunk_tokens[j] for j in no_answer]
             )
-            answer = answer_result[0]['generated_text'].strip()
+            for j, qa_pair in zip(no_answer, answered):
+                qa_pairs[j] = qa_pair
+        
+        return qa_pairs
+    
+    def _shared_encoder_pair(self, chunk: str,
+                             seen_questions: Optional[QuestionDeduplicator] = None) -> Dict[str, str]:
+        """Encode the chunk once and decode both question and answer from it
+        
+        The answer decode is primed with "<question> Answer:" as a decoder
+        prefix instead of re-encoding the chunk together with the question.
+        It is skipped for questions that fail _gate_questions.
+        """
+        import torch
+        
+        tokenizer, model = self.generator.tokenizer, self.generator.model
+        prompt = QUESTION_PROMPT.format(chunk=chunk)
+        chunk_tokens = self.chunker.count_tokens([chunk])[0]
+        stop_ids = {name: list(ids) for name, ids in self._stop_kwargs(QUESTION_STOPS).items()}
+        
+        with metrics.time("shared_encoder_decode"), getattr(self.generator, "lock", nullcontext()):
+            inputs = tokenizer(prompt, return_tensors="pt", truncation=True,
+                               max_length=self.max_input_tokens).to(model.device)
+            with torch.no_grad():
+                encoder_outputs = model.get_encoder()(**inputs)
             
-            # Clean up the generated text
-            question = re.sub(r'^(Question:|Q:)\s*', '', question, flags=re.IGNORECASE)
-            answer = re.sub(r'^(Answer:|A:)\s*', '', answer, flags=re.IGNORECASE)
+            question_ids = model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=inputs["attention_mask"],
+                max_length=decode_budget(chunk_tokens, QUESTION_BUDGET),
+                **self.question_kwargs,
+                **stop_ids
+            )
+            question = tokenizer.decode(question_ids[0], skip_special_tokens=True).strip()
+            question = clean_question(cut_at_stop(question, QUESTION_STOPS, keep_stop=True))
             
-            return {"question": question, "answer": answer}
+            # Usage is counted from the encodings the decodes already made
+            input_tokens = inputs["input_ids"].shape[1]
+            question_tokens = question_ids.shape[1]
+            reason = self._gate_questions([chunk], [question], seen_questions)[0]
+            if reason:
+                self._record_usage(1, 1, input_tokens, question_tokens)
+                return {"question": question, "answer": "", "skipped": reason}
             
-        except Exception as e:
-            print(f"Error generating Q&A pair: {e}")
-            return self.generate_fallback_pair(chunk)
+            prefix_ids = tokenizer(f"{question} Answer:", add_special_tokens=False,
+                                   return_tensors="pt").input_ids.to(model.device)
+            decoder_input_ids = torch.cat([question_ids[:, :1], prefix_ids], dim=1)
+            answer_ids = model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=inputs["attention_mask"],
+                decoder_input_ids=decoder_input_ids,
+                max_new_tokens=decode_budget(chunk_tokens, ANSWER_BUDGET),
+                **self.answer_kwargs
+            )
+            answer = tokenizer.decode(answer_ids[0, decoder_input_ids.shape[1]:], skip_special_tokens=True).strip()
+            answer = cut_at_stop(answer, ANSWER_STOPS)
+        
+        answer_tokens = answer_ids.shape[1] - decoder_input_ids.shape[1]
+        self._record_usage(2, 1, input_tokens, question_tokens + answer_tokens)
+        return {"question": question, "answer": clean_answer(answer)}
     
     def generate_fallback_pair(self, chunk: str) -> Dict[str, str]:
-        """Generate basic question-answer pair without LLM"""
+        """Generate basic question-answer pair without LLM, marked as a fallback"""
+        with metrics.time("fallback"):
+            return {**self._fallback_pair(chunk), "fallback": True}
+    
+    def _fallback_pair(self, chunk: str) -> Dict[str, str]:
         words = chunk.split()
         if len(words) > 10:
             # Create fill-in-the-blank style question
@@ -109,80 +723,352 @@ class FlashcardGenerator:
     
     def assign_difficulty(self, question: str, answer: str) -> str:
         """Assign difficulty level based on question and answer complexity"""
-        # Simple heuristic based on length and complexity
-        total_length = len(question) + len(answer)
-        complex_words = len([w for w in (question + " " + answer).split() if len(w) > 8])
-        
-        if total_length < 100 and complex_words < 2:
-            return "Easy"
-        elif total_length > 200 or complex_words > 5:
-            return "Hard"
-        else:
-            return "Medium"
+        return self.classifier.classify([""], [question], [answer])[0][0]
     
     def detect_topic(self, chunk: str, index: int) -> str:
         """Detect topic/subject from text chunk"""
-        # Simple topic detection based on keywords
-        science_keywords = ['experiment', 'hypothesis', 'theory', 'research', 'study', 'analysis']
-        history_keywords = ['century', 'war', 'empire', 'revolution', 'ancient', 'medieval']
-        math_keywords = ['equation', 'formula', 'calculate', 'theorem', 'proof', 'variable']
-        
-        chunk_lower = chunk.lower()
-        
-        if any(keyword in chunk_lower for keyword in science_keywords):
-            return "Science"
-        elif any(keyword in chunk_lower for keyword in history_keywords):
-            return "History"
-        elif any(keyword in chunk_lower for keyword in math_keywords):
-            return "Mathematics"
-        else:
-            return f"Section {index + 1}"
+        return self.classifier.classify([chunk], [""], [""], [index])[0][1]
     
-    def generate_flashcards(self, text: str, num_cards: int = 15) -> List[Dict[str, Any]]:
-        """Generate flashcards from input text"""
-        if not text or len(text.strip()) < 50:
-            return []
+    def iter_selected_chunks(self, text: Union[str, Iterable[str]], num_cards: int,
+                             selection: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """Lazily yield (index, chunk) pairs worth generating cards for
+        
+        text may be a string or an iterable of text pieces such as PDF pages,
+        which are chunked as they arrive. With "coverage" selection the whole
+        text is chunked and scored first, and num_cards chunks spread over the
+        document are yielded in order, skipping near-duplicates; with
+        "leading" selection the first num_cards chunks are yielded as soon as
+        they are chunked. selection defaults to the generator's for complete
+        strings and to "leading" for iterables, since scoring them would mean
+        reading the whole document before the first card.
+        """
+        if selection is None:
+            selection = self.selection if isinstance(text, str) or text is None else "leading"
+        if isinstance(text, str) or text is None:
+            if not text or len(text.strip()) < 50:
+                return
+            text = [text]
+        
+        if selection == "leading":
+            chunks = metrics.time_iter(self.chunker.iter_chunks(text), "chunking")
+            for i, chunk in enumerate(islice(chunks, num_cards)):
+                # Skip very short chunks
+                if len(chunk.strip()) >= 50:
+                    yield i, chunk
+            return
+        
+        with metrics.time("chunking"):
+            chunks = [(i, chunk) for i, chunk in enumerate(self.chunker.iter_chunks(text))
+                      if len(chunk.strip()) >= 50]
+        with metrics.time("selection"):
+            picked = select_representative([chunk for _, chunk in chunks], num_cards)
+        for j in picked:
+            yield chunks[j]
+    
+    def select_chunks(self, text: str, num_cards: int) -> List[Tuple[int, str]]:
+        """Split text and return (index, chunk) pairs worth generating cards for"""
+        return list(self.iter_selected_chunks(text, num_cards))
+    
+    def keep_pair(self, qa_pair: Dict[str, str],
+                  seen_questions: Optional[QuestionDeduplicator] = None) -> bool:
+        """Check a question-answer pair is worth a card, counting produced and dropped cards
+        
+        Pairs are dropped if either side is too short, or if seen_questions
+        (shared by the cards of one deck) already holds a near-identical question.
+        """
+        question, answer = qa_pair["question"], qa_pair["answer"]
+        if qa_pair.get("skipped"):
+            metrics.inc("flashcard_cards_dropped_total", reason=qa_pair["skipped"])
+            return False
+        if not (question and answer and len(question) > MIN_CARD_TEXT and len(answer) > MIN_CARD_TEXT):
+            metrics.inc("flashcard_cards_dropped_total", reason="too_short")
+            return False
+        if seen_questions is not None and seen_questions.seen(question):
+            metrics.inc("flashcard_cards_dropped_total", reason="duplicate")
+            return False
+        
+        metrics.inc("flashcard_cards_produced_total")
+        return True
+    
+    def make_flashcards(self, items: List[Tuple[Dict[str, str], str, int]]) -> List[Dict[str, Any]]:
+        """Turn (qa_pair, chunk, index) items into flashcards, classifying them in one batch"""
+        with metrics.time("classification"):
+            labels = self.classifier.classify(
+                [chunk for _, chunk, _ in items],
+                [qa_pair["question"] for qa_pair, _, _ in items],
+                [qa_pair["answer"] for qa_pair, _, _ in items],
+                [index for _, _, index in items]
+            )
+        
+        return [
+            {
+                "question": qa_pair["question"],
+                "answer": qa_pair["answer"],
+                "difficulty": difficulty,
+                "topic": topic
+            }
+            for (qa_pair, _, _), (difficulty, topic) in zip(items, labels)
+        ]
+    
+    def build_flashcards(self, qa_pairs: List[Dict[str, str]], chunks: List[Tuple[int, str]],
+                         seen_questions: Optional[QuestionDeduplicator] = None) -> List[Dict[str, Any]]:
+        """Turn the question-answer pairs of (index, chunk) pairs into flashcards, skipping rejected pairs"""
+        return self.make_flashcards([
+            (qa_pair, chunk, i)
+            for (i, chunk), qa_pair in zip(chunks, qa_pairs)
+            if self.keep_pair(qa_pair, seen_questions)
+        ])
+    
+    def iter_flashcards(self, text: Union[str, Iterable[str]], num_cards: int = 15,
+                        batch_size: Optional[int] = None,
+                        selection: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield flashcards from input text as soon as each chunk is processed
         
-        flashcards = []
-        chunks = self.split_into_chunks(text, 400)
+        With batch_size=None every chunk is generated on its own, which gives
+        the lowest time to first card; otherwise chunks are generated in
+        batches of batch_size and a batch's cards are yielded together.
+        text may also be an iterable of text pieces (e.g. from iter_pdf_pages),
+        in which case generation starts before the whole document is read
+        (iterables use "leading" selection unless selection says otherwise).
+        """
+        key = None
+        # Fallback cards are cheap and would mask the model once it loads or
+        # recovers, so decks holding any are not cached (see below). Streamed
+        # input has no document key up front.
+        if self.cache is not None and isinstance(text, str) and self.generator:
+            key = self.document_cache_key(text, num_cards, selection=selection)
+            cached = self.cache.get_document(key)
+            if cached is not None:
+                yield from cached
+                return
         
-        for i, chunk in enumerate(chunks[:num_cards]):
-            if len(chunk.strip()) < 50:  # Skip very short chunks
-                continue
+        start = time.perf_counter()
+        # Cards are only collected when the deck will be cached
+        flashcards = [] if key else None
+        seen_questions = QuestionDeduplicator()
+        selected = self.iter_selected_chunks(text, num_cards, selection)
+        step = batch_size or 1
+        
+        while True:
+            batch = list(islice(selected, step))
+            if not batch:
+                break
             
-            # Generate question-answer pair
-            qa_pair = self.generate_question_answer_pair(chunk)
+            # Generate question-answer pairs
+            if batch_size:
+                qa_pairs = self.generate_question_answer_pairs([chunk for _, chunk in batch], batch_size,
+                                                               seen_questions)
+            else:
+                qa_pairs = [self.generate_question_answer_pair(chunk, seen_questions) for _, chunk in batch]
+            if key and any(qa_pair.get("fallback") for qa_pair in qa_pairs):
+                key = None
             
-            if qa_pair["question"] and qa_pair["answer"] and \
-               len(qa_pair["question"]) > 10 and len(qa_pair["answer"]) > 10:
-                
-                flashcard = {
-                    "question": qa_pair["question"],
-                    "answer": qa_pair["answer"],
-                    "difficulty": self.assign_difficulty(qa_pair["question"], qa_pair["answer"]),
-                    "topic": self.detect_topic(chunk, i)
-                }
-                
-                flashcards.append(flashcard)
-        
-        return flashcards
-
-
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file"""
+            for flashcard in self.build_flashcards(qa_pairs, batch, seen_questions):
+                if key:
+                    flashcards.append(flashcard)
+                yield flashcard
+        
+        # Only reached if the caller consumed every card
+        if key:
+            self.cache.put_document(key, flashcards, time.perf_counter() - start)
+    
+    def chunk_fingerprint(self, chunk: str) -> str:
+        """Identity of a chunk's cards: its text plus every setting that shapes them"""
+        return make_cache_key("deck-chunk", self.chunk_cache_key(chunk), self.classifier.fingerprint)
+    
+    def update_flashcards(self, text: str, previous: Optional[List[Dict[str, Any]]] = None,
+                          batch_size: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Regenerate a deck for a new version of a document, reusing unchanged chunks
+        
+        The text is split with the edit-stable chunker and every chunk (not
+        just num_cards of them) gets a card. previous is the chunk list this
+        method returned for the last version: [{"fingerprint", "cards"}, ...].
+        Only chunks whose fingerprint isn't in it are sent to the model, so
+        the work scales with the size of the edit. Returns the new chunk list
+        and the number of chunks added, removed and unchanged.
+        """
+        with metrics.time("chunking"):
+            chunks = [chunk for chunk in self.stable_chunker.split(text or "") if len(chunk.strip()) >= 50]
+            fingerprints = [self.chunk_fingerprint(chunk) for chunk in chunks]
+        
+        known = {entry["fingerprint"]: entry["cards"] for entry in previous or [] if entry.get("fingerprint")}
+        todo = {}  # fingerprint -> (index, chunk), once per distinct new chunk
+        for i, (chunk, fingerprint) in enumerate(zip(chunks, fingerprints)):
+            if fingerprint not in known and fingerprint not in todo:
+                todo[fingerprint] = (i, chunk)
+        
+        # Chunks that only got fallback cards (no model, or a failed generation)
+        # are stored without a fingerprint, so the next version retries them
+        fallbacks = set()
+        batch_size = batch_size or self.batch_size
+        new_cards = {fingerprint: [] for fingerprint in todo}
+        pending = list(todo.items())
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            qa_pairs = self.generate_question_answer_pairs([chunk for _, (_, chunk) in batch], batch_size)
+            fallbacks.update(fingerprint for (fingerprint, _), qa_pair in zip(batch, qa_pairs)
+                             if qa_pair.get("fallback"))
+            kept = [(fingerprint, (qa_pair, chunk, i))
+                    for (fingerprint, (i, chunk)), qa_pair in zip(batch, qa_pairs)
+                    if self.keep_pair(qa_pair)]
+            for (fingerprint, _), flashcard in zip(kept, self.make_flashcards([item for _, item in kept])):
+                new_cards[fingerprint].append(flashcard)
+        
+        entries = [
+            {
+                "fingerprint": None if fingerprint in fallbacks else fingerprint,
+                "cards": known[fingerprint] if fingerprint in known else new_cards[fingerprint]
+            }
+            for fingerprint in fingerprints
+        ]
+        stats = {
+            "chunks": len(chunks),
+            "added": sum(fingerprint not in known for fingerprint in fingerprints),
+            "removed": len(set(known) - set(fingerprints)),
+            "unchanged": sum(fingerprint in known for fingerprint in fingerprints),
+        }
+        return entries, stats
+    
+    def generate_flashcards(self, text: str, num_cards: int = 15) -> List[Dict[str, Any]]:
+        """Generate flashcards from input text"""
+        return list(self.iter_flashcards(text, num_cards))
+    
+    def generate_flashcards_batch(self, text: str, num_cards: int = 15,
+                                  batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Generate flashcards from input text, batching model calls across all chunks"""
+        return list(self.iter_flashcards(text, num_cards, batch_size=batch_size or self.batch_size))
+
+
+MAX_PDF_PAGES = 1000
+PARALLEL_MIN_PAGES = 500
+PAGES_PER_TASK = 25
+# Bytes of an uploaded text file decoded at a time
+TEXT_READ_SIZE = 64 * 1024
+
+
+class PDFTooLargeError(ValueError):
+    """Raised when a PDF, or the requested page range, has more pages than allowed"""
+
+
+def _resolve_page_range(page_count: int, first_page: int, last_page: Optional[int],
+                        max_pages: int) -> Tuple[int, int]:
+    """Turn a 1-based inclusive page range into 0-based [start, stop) and enforce max_pages"""
+    start = max(first_page, 1) - 1
+    stop = page_count if last_page is None else min(last_page, page_count)
+    stop = max(stop, start)
+    
+    if stop - start > max_pages:
+        raise PDFTooLargeError(f"PDF has {stop - start} pages to extract, the limit is {max_pages}")
+    
+    return start, stop
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop); runs in a worker process"""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [(pdf_reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+def _iter_pdf_pages_parallel(file_path: str, start: int, stop: int, workers: int) -> Iterator[str]:
+    """Extract page ranges in a process pool and yield the pages in order"""
+    from concurrent.futures import ProcessPoolExecutor
+    
+    page_ranges = iter([(i, min(i + PAGES_PER_TASK, stop)) for i in range(start, stop, PAGES_PER_TASK)])
+    executor = ProcessPoolExecutor(max_workers=workers)
     try:
-        import PyPDF2
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        print(f"Error extracting PDF: {e}")
+        # Keep a bounded window of ranges in flight so parsed pages the caller
+        # hasn't consumed yet don't pile up in memory
+        pending = deque(
+            executor.submit(_extract_page_range, file_path, *page_range)
+            for page_range in islice(page_ranges, workers * 2)
+        )
+        while pending:
+            pages = pending.popleft().result()
+            for page_range in islice(page_ranges, 1):
+                pending.append(executor.submit(_extract_page_range, file_path, *page_range))
+            yield from pages
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pdf_pages(source: Union[str, BinaryIO], first_page: int = 1, last_page: Optional[int] = None,
+                   max_pages: int = MAX_PDF_PAGES, workers: int = 0,
+                   parallel_min_pages: int = PARALLEL_MIN_PAGES) -> Iterator[str]:
+    """Yield the text of each PDF page lazily, in order
+    
+    source is a file path or a seekable binary stream such as an upload.
+    Pages are parsed only as the caller asks for them, so chunking and
+    generation can start on page 1 while later pages are still unparsed.
+    Every page ends in a newline, so the last word of a page and the first
+    of the next stay apart however the pages are chunked or joined.
+    first_page/last_page select a 1-based inclusive page range, and more than
+    max_pages pages raises PDFTooLargeError. With workers > 1, ranges of at
+    least parallel_min_pages pages are extracted PAGES_PER_TASK pages at a
+    time in a process pool; smaller ones aren't worth the process startup.
+    """
+    import PyPDF2
+    file = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        pdf_reader = PyPDF2.PdfReader(file)
+        start, stop = _resolve_page_range(len(pdf_reader.pages), first_page, last_page, max_pages)
+        
+        if workers <= 1 or stop - start < parallel_min_pages:
+            for i in range(start, stop):
+                yield (pdf_reader.pages[i].extract_text() or "") + "\n"
+            return
+    finally:
+        if file is not source:
+            file.close()
+    
+    if isinstance(source, str):
+        yield from _iter_pdf_pages_parallel(source, start, stop, workers)
+        return
+    
+    # Worker processes open the PDF by path, so copy the stream to a private
+    # temporary file; only PDFs big enough for the process pool pay for this
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as pdf_copy:
+        shutil.copyfileobj(source, pdf_copy)
+    try:
+        yield from _iter_pdf_pages_parallel(pdf_copy.name, start, stop, workers)
+    finally:
+        os.remove(pdf_copy.name)
+
+
+def extract_text_from_pdf(source: Union[str, BinaryIO], first_page: int = 1, last_page: Optional[int] = None,
+                          max_pages: int = MAX_PDF_PAGES, workers: int = 0) -> str:
+    """Extract text from a PDF file path or binary stream"""
+    try:
+        pages = iter_pdf_pages(source, first_page, last_page, max_pages, workers)
+        return "".join(pages)
+    except PDFTooLargeError:
+        raise
+    except Exception:
+        logger.exception("Error extracting PDF")
         return ""
 
 
+def iter_decoded_text(stream: BinaryIO, encoding: str = 'utf-8', errors: str = 'replace',
+                      read_size: int = TEXT_READ_SIZE) -> Iterator[str]:
+    """Decode a binary stream read_size bytes at a time
+
+    Multi-byte characters split across reads are carried over to the next
+    piece, so the pieces join to the same text as decoding the whole stream.
+    Invalid bytes are replaced (with errors='replace', the default), as
+    bulk_generate does for text files, rather than failing the upload.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    while True:
+        data = stream.read(read_size)
+        text = decoder.decode(data, final=not data)
+        if text:
+            yield text
+        if not data:
+            return
+
+
 def process_educational_content(content: str, file_path: str = None) -> List[Dict[str, Any]]:
     """Main function to process educational content and generate flashcards"""
     generator = FlashcardGenerator()
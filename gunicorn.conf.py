@@ -0,0 +1,94 @@
+"""
+Flashcard Generator - Production Server
+Pre-fork gunicorn settings: the model is loaded once in the master process and
+shared copy-on-write by every worker, so extra workers add little memory
+
+    gunicorn                 # run from this directory; reads this file
+    kill -HUP <master pid>   # graceful restart: new workers start, old ones finish their requests
+"""
+
+import gc
+import glob
+import os
+
+
+wsgi_app = "app:app"
+bind = os.environ.get('FLASHCARD_BIND', '0.0.0.0:5001')
+
+# Worker processes, and threads per worker (concurrent requests in one worker
+# share model batches through the request batcher)
+workers = int(os.environ.get('FLASHCARD_WORKERS', max((os.cpu_count() or 1) // 2, 1)))
+threads = int(os.environ.get('FLASHCARD_WORKER_THREADS', 4))
+# Torch intra-op threads per worker; by default the cores are split between workers
+TORCH_THREADS = int(os.environ.get('FLASHCARD_TORCH_THREADS', 0)) or max((os.cpu_count() or 1) // workers, 1)
+# Run one tiny generation in each new worker so its first request is fast
+WARM_UP = os.environ.get('FLASHCARD_WARM_UP', '1') == '1'
+
+# Import the app, and load the model, in the master before forking
+preload_app = True
+# Generating a long document can take minutes
+timeout = int(os.environ.get('FLASHCARD_TIMEOUT', 300))
+# How long old workers may finish their requests on restart or shutdown
+graceful_timeout = int(os.environ.get('FLASHCARD_GRACEFUL_TIMEOUT', 120))
+# Replace a worker after this many requests (0: never), staggered by the jitter
+max_requests = int(os.environ.get('FLASHCARD_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# The tokenizer is first used after fork
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+# Requests are spread over the workers, so jobs, decks and reviews must be in
+# stores every worker can read: unless configured otherwise, keep them in
+# SQLite files under FLASHCARD_DATA_DIR
+DATA_DIR = os.environ.get('FLASHCARD_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+if workers > 1:
+    for setting, filename in (('FLASHCARD_JOB_STORE_PATH', 'jobs.sqlite3'),
+                              ('FLASHCARD_DECK_STORE_PATH', 'decks.sqlite3'),
+                              ('FLASHCARD_NAMED_DECKS_PATH', 'named_decks.sqlite3'),
+                              ('FLASHCARD_REVIEW_DB_PATH', 'reviews.sqlite3')):
+        os.environ.setdefault(setting, os.path.join(DATA_DIR, filename))
+    # /metrics may be answered by any worker, so each one publishes its
+    # metrics here and the answer sums them
+    os.environ.setdefault('FLASHCARD_METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+
+
+def on_starting(server):
+    """Forget the metrics of a previous server, as Prometheus expects counters to restart from zero"""
+    directory = os.environ.get('FLASHCARD_METRICS_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Load the model weights in the master (without running them) before workers fork"""
+    import app
+    if app.preload_model():
+        server.log.info("Model %s (%s) loaded in the master", app.MODEL_NAME, app.INFERENCE_BACKEND)
+    else:
+        server.log.warning("Model failed to load, workers will use the fallback generator")
+    local = app.process_local_stores()
+    if server.cfg.workers > 1 and local:
+        server.log.warning("Stores kept in each worker's memory (%s): requests served by another worker "
+                           "won't find their data; point these settings at SQLite files", ", ".join(local))
+    # Objects that exist now are never collected, so the collector doesn't
+    # write to (and un-share) the pages they live on
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    try:
+        import torch
+    except ImportError:
+        pass
+    else:
+        torch.set_num_threads(TORCH_THREADS)
+
+    import app
+    app.init_worker()
+
+
+def post_worker_init(worker):
+    if WARM_UP:
+        import app
+        app.warm_up(app.MODEL_NAME, app.INFERENCE_BACKEND)
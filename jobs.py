@@ -0,0 +1,329 @@
+"""
+Flashcard Generator - Background Jobs
+Bounded worker pool and job store for running flashcard generation off the request thread
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlite_store import Reconnectable, SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class JobStore(Reconnectable, ABC):
+    """Storage interface for job records, so the in-memory store can be swapped out
+
+    Job records are plain dicts with: id, status (queued, running, completed,
+    failed, cancelled), progress ({"done", "total"}), results, error,
+    cancel_requested, created_at and updated_at.
+    """
+
+    @abstractmethod
+    def create(self) -> str:
+        """Create a queued job and return its id"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of the job record, or None if it doesn't exist"""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        """Set fields on a job record"""
+
+    @abstractmethod
+    def add_results(self, job_id: str, results: List[Any]):
+        """Append partial results to a job"""
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        """Remove a job record"""
+
+
+class InMemoryJobStore(JobStore):
+    """Thread-safe job store kept in process memory
+
+    Only the most recent max_jobs records are kept; the oldest finished jobs
+    are dropped first so the store can't grow without bound.
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "progress": {"done": 0, "total": 0},
+                "results": [],
+                "error": None,
+                "cancel_requested": False,
+                "created_at": now,
+                "updated_at": now
+            }
+            self._prune()
+        return job_id
+
+    def _prune(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED_STATUSES]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["progress"] = dict(job["progress"])
+            snapshot["results"] = list(job["results"])
+            return snapshot
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                job["updated_at"] = time.time()
+
+    def add_results(self, job_id: str, results: List[Any]):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["results"].extend(results)
+                job["updated_at"] = time.time()
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+class SQLiteJobStore(SQLiteStore, JobStore):
+    """Job store in SQLite, so every worker process sees every job
+
+    A job runs in the process that accepted it, but its status, progress and
+    results, and cancellation requests, go through the database, so polling or
+    cancelling can be served by any worker. Results are kept one row each, so
+    reporting progress appends rows instead of rewriting the job.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id TEXT PRIMARY KEY, status TEXT NOT NULL, progress TEXT NOT NULL, error TEXT, "
+        "cancel_requested INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS job_results ("
+        "job_id TEXT NOT NULL, position INTEGER NOT NULL, result TEXT NOT NULL, "
+        "PRIMARY KEY (job_id, position))",
+        "CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)",
+    )
+    COLUMNS = ("status", "progress", "error", "cancel_requested")
+
+    def __init__(self, path: str, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        super().__init__(path)
+
+    def _prune(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        excess = count - self.max_jobs
+        if excess <= 0:
+            return
+        placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+        finished = [row[0] for row in self._conn.execute(
+            f"SELECT id FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at LIMIT ?",
+            (*FINISHED_STATUSES, excess)
+        )]
+        self._conn.executemany("DELETE FROM job_results WHERE job_id = ?", [(job_id,) for job_id in finished])
+        self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in finished])
+
+    def create(self) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, progress, error, cancel_requested, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, NULL, 0, ?, ?)",
+                (job_id, json.dumps({"done": 0, "total": 0}), now, now)
+            )
+            self._prune()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, progress, error, cancel_requested, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            results = self._conn.execute(
+                "SELECT result FROM job_results WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        status, progress, error, cancel_requested, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "status": status,
+            "progress": json.loads(progress),
+            "results": [json.loads(result) for (result,) in results],
+            "error": error,
+            "cancel_requested": bool(cancel_requested),
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+    def update(self, job_id: str, **fields):
+        results = fields.pop("results", None)
+        values = {name: json.dumps(value) if name == "progress" else value
+                  for name, value in fields.items() if name in self.COLUMNS}
+        values["updated_at"] = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET " + ", ".join(f"{name} = ?" for name in values) + " WHERE id = ?",
+                (*values.values(), job_id)
+            )
+            if results is not None and cursor.rowcount:
+                self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+                self._insert_results(job_id, results, 0)
+
+    def add_results(self, job_id: str, results: List[Any]):
+        if not results:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(position), -1) FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            self._insert_results(job_id, results, row[0] + 1)
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def _insert_results(self, job_id: str, results: List[Any], start: int):
+        self._conn.executemany(
+            "INSERT INTO job_results (job_id, position, result) VALUES (?, ?, ?)",
+            [(job_id, start + i, json.dumps(result)) for i, result in enumerate(results)]
+        )
+
+    def delete(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool with a queue depth limit
+
+    At most max_workers jobs run at once and at most max_queue more may wait;
+    submitting beyond that raises QueueFullError so callers can apply
+    backpressure (e.g. HTTP 429) instead of queueing unbounded work.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 2, max_queue: int = 8):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flashcard-job")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., List[Any]], *args, **kwargs) -> str:
+        """Queue func(*args, on_progress=..., **kwargs) and return the job id
+
+        func reports progress by calling on_progress(done, total, new_results);
+        on_progress raises JobCancelled once the job has been cancelled.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Too many jobs queued, try again later")
+
+        job_id = self.store.create()
+        try:
+            future = self._executor.submit(self._run, job_id, func, args, kwargs)
+        except Exception:
+            self._slots.release()
+            self.store.delete(job_id)
+            raise
+
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._finish(job_id))
+        return job_id
+
+    def _finish(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        self._slots.release()
+
+    def _run(self, job_id: str, func, args, kwargs):
+        job = self.store.get(job_id)
+        if job is None or job["cancel_requested"]:
+            self.store.update(job_id, status="cancelled")
+            return
+
+        self.store.update(job_id, status="running")
+
+        def on_progress(done: int, total: int, new_results: Optional[List[Any]] = None):
+            if new_results:
+                self.store.add_results(job_id, new_results)
+            self.store.update(job_id, progress={"done": done, "total": total})
+            job = self.store.get(job_id)
+            if job is None or job["cancel_requested"]:
+                raise JobCancelled(job_id)
+
+        try:
+            results = func(*args, on_progress=on_progress, **kwargs)
+            self.store.update(job_id, status="completed", results=list(results))
+        except JobCancelled:
+            self.store.update(job_id, status="cancelled")
+        except Exception as e:
+            logger.exception("Error in job %s", job_id)
+            self.store.update(job_id, status="failed", error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of a job"""
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; queued jobs never start, running jobs stop at the next chunk"""
+        job = self.store.get(job_id)
+        if job is None:
+            return False
+        if job["status"] in FINISHED_STATUSES:
+            return True
+
+        self.store.update(job_id, cancel_requested=True)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self.store.update(job_id, status="cancelled")
+        return True
+
+    def queue_depth(self) -> int:
+        """Number of jobs queued or running"""
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,291 @@
+"""
+Flashcard Generator - Metrics
+Per-stage timings and pipeline counters, exported in the Prometheus text format,
+optionally merged across the worker processes of one server
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+
+# Histogram bucket upper bounds in seconds, from cache lookups to long PDFs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help) for every metric the application records
+METRICS = {
+    "flashcard_stage_seconds": ("histogram", "Time spent in each pipeline stage"),
+    "flashcard_http_request_seconds": ("histogram", "HTTP request latency until the response is returned"),
+    "flashcard_http_requests_total": ("counter", "HTTP requests by endpoint and status code"),
+    "flashcard_model_calls_total": ("counter", "Batched model invocations"),
+    "flashcard_prompts_total": ("counter", "Prompts decoded by the model"),
+    "flashcard_tokens_total": ("counter", "Model tokens in (prompts) and out (generated text)"),
+    "flashcard_cards_produced_total": ("counter", "Flashcards produced"),
+    "flashcard_cards_dropped_total": ("counter", "Question-answer pairs dropped, by reason"),
+    "flashcard_answer_decodes_skipped_total": ("counter", "Answer decodes skipped because the question was degenerate, by reason"),
+    "flashcard_fallbacks_total": ("counter", "Question-answer pairs or decks made without the model, by reason"),
+    "flashcard_model_errors_total": ("counter", "Model calls that raised and were retried or replaced by a fallback"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+T = TypeVar("T")
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(pairs: LabelKey) -> str:
+    if not pairs:
+        return ""
+    escaped = ((name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for name, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms keyed by metric name and labels"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Bumped on every change, so share() only rewrites changed values
+        self._version = 0
+        self._share_path: Optional[str] = None
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add amount to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+            self._version += 1
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a duration in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {}).get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = _Histogram(self.buckets)
+            histogram.counts[bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+            self._version += 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time a pipeline stage, adding it to the current request's breakdown if one is collected"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("flashcard_stage_seconds", seconds, stage=stage)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def time_iter(self, iterable: Iterable[T], stage: str) -> Iterator[T]:
+        """Yield from iterable, timing every pull of an item as part of a pipeline stage
+
+        For lazily read input (PDF pages, chunks), where the stage's work is
+        spread over the consumer's loop. Time spent pulling from a nested
+        time_iter (e.g. the pages a chunker reads) counts towards that one's
+        stage only. The total is observed once, when the iterator is exhausted
+        or closed, and added to the breakdown collected when it started.
+        """
+        timings = _request_timings.get()
+        pulls = self._pulls()
+        total = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                # Nested pulls add their time to the last entry of pulls
+                pulls.append(0.0)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed = time.perf_counter() - start
+                    total += elapsed - pulls.pop()
+                    if pulls:
+                        pulls[-1] += elapsed
+                yield item
+        finally:
+            self.observe("flashcard_stage_seconds", total, stage=stage)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + total
+
+    def _pulls(self) -> List[float]:
+        """This thread's stack of time_iter pulls in progress"""
+        if not hasattr(self._local, "pulls"):
+            self._local.pulls = []
+        return self._local.pulls
+
+    def collect_timings(self, timings: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Start collecting a per-stage breakdown for the current request (or thread)
+
+        Returns the dict (timings, or a new one) that stage timings of this
+        context are added to.
+        """
+        timings = {} if timings is None else timings
+        _request_timings.set(timings)
+        return timings
+
+    def stop_timings(self):
+        """Stop collecting the current context's breakdown (threads may serve many requests)"""
+        _request_timings.set(None)
+
+    def share(self, directory: str, interval: float = 1.0):
+        """Publish this process's metrics in directory, and render the sum over every process there
+
+        For servers with several worker processes behind one socket, where a
+        scrape reaches any one of them. Each process writes its values to
+        <directory>/<pid>.json every interval seconds (if they changed) and at
+        exit. Files of exited workers are kept, so counters never go back
+        when a worker is replaced; clear the directory when the server starts.
+        Call it right after fork: values inherited from the parent are dropped,
+        as they would otherwise be counted once per worker.
+        """
+        self.reset()
+        os.makedirs(directory, exist_ok=True)
+        # Not just the pid, which a later worker may be given again
+        self._share_path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+        self._flushed_version = -1
+        self._write_snapshot()
+        atexit.register(self._write_snapshot)
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                if self._version != self._flushed_version:
+                    self._write_snapshot()
+
+        threading.Thread(target=flush, name="metrics-flush", daemon=True).start()
+
+    def snapshot(self) -> Dict[str, list]:
+        """All recorded values as JSON-serializable lists"""
+        with self._lock:
+            return {
+                "counters": [[name, key, value]
+                             for name, series in self._counters.items() for key, value in series.items()],
+                "histograms": [[name, key, histogram.counts, histogram.sum, histogram.count]
+                               for name, series in self._histograms.items()
+                               for key, histogram in series.items()],
+            }
+
+    def _write_snapshot(self):
+        version = self._version
+        snapshot = self.snapshot()
+        # Readers must never see a half-written file
+        temporary = f"{self._share_path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, self._share_path)
+        self._flushed_version = version
+
+    def _shared_snapshots(self) -> List[Dict[str, list]]:
+        """This process's snapshot plus the last published one of every other process"""
+        snapshots = [self.snapshot()]
+        if self._share_path is None:
+            return snapshots
+        for path in glob.glob(os.path.join(os.path.dirname(self._share_path), "*.json")):
+            if path == self._share_path:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._version += 1
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format
+
+        gauges maps extra gauge names to (help, value) for point-in-time
+        values such as queue depth, read when the metrics are scraped. After
+        share(), counters and histograms are summed over all the processes.
+        """
+        counters: Dict[str, Dict[LabelKey, float]] = {}
+        histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        for snapshot in self._shared_snapshots():
+            for name, key, value in snapshot["counters"]:
+                series = counters.setdefault(name, {})
+                key = tuple(map(tuple, key))
+                series[key] = series.get(key, 0) + value
+            for name, key, counts, total, count in snapshot["histograms"]:
+                key = tuple(map(tuple, key))
+                histogram = histograms.setdefault(name, {}).get(key)
+                if histogram is None:
+                    histogram = histograms[name][key] = _Histogram(self.buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+        lines: List[str] = []
+        for name, series in sorted(counters.items()):
+            metric_type, help_text = METRICS.get(name, ("counter", name))
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name, series in sorted(histograms.items()):
+            metric_type, help_text = METRICS.get(name, ("histogram", name))
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Format a stage breakdown as a Server-Timing header value (durations in ms)"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
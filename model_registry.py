@@ -0,0 +1,151 @@
+"""
+Flashcard Generator - Model Registry
+Process-wide cache of text generation pipelines, loaded lazily on first use
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+from backends import DEFAULT_BACKEND, load_pipeline
+from batching import BatchingGenerator, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MODEL_NAME = "google/flan-t5-base"
+DEFAULT_PIPELINE_SETTINGS = {"max_length": 512}
+
+
+class SharedGenerator:
+    """Thread-safe wrapper around a loaded text2text-generation pipeline
+
+    Hugging Face pipelines and fast tokenizers are not safe to call from
+    several threads at once, so calls are serialized on a per-model lock.
+    Code that uses the tokenizer and model directly should hold the same lock.
+    """
+
+    def __init__(self, pipeline, model_name: str):
+        self.pipeline = pipeline
+        self.model_name = model_name
+        self.lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        return self.pipeline.tokenizer
+
+    @property
+    def model(self):
+        return self.pipeline.model
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            return self.pipeline(*args, **kwargs)
+
+
+class ModelRegistry:
+    """Loads each (model name, backend, pipeline settings) combination once per process"""
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Optional[SharedGenerator]] = {}
+        self._batching: Dict[Tuple, BatchingGenerator] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name: str, backend: str, settings: Dict[str, Any]) -> Tuple:
+        """Build the registry key for a model, its backend and its pipeline settings"""
+        return (model_name, backend, tuple(sorted(settings.items())))
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND,
+            **settings) -> Optional[SharedGenerator]:
+        """Return the shared generator for model_name on backend, loading it on first use
+
+        Returns None if the model could not be loaded; the failure is cached so
+        later calls fall back immediately instead of retrying the download.
+        """
+        settings = {**DEFAULT_PIPELINE_SETTINGS, **settings}
+        key = self.make_key(model_name, backend, settings)
+
+        if key in self._entries:
+            return self._entries[key]
+
+        # One lock per key so loading one model doesn't block lookups of another
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._entries:
+                self._entries[key] = self._load(model_name, backend, settings)
+
+        return self._entries[key]
+
+    def get_batching(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND,
+                     max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                     **settings) -> Optional[BatchingGenerator]:
+        """Return a request-batching front end for the shared generator of model_name
+        
+        Every caller asking for the same model and batching limits gets the
+        same BatchingGenerator, so their prompts are merged into shared batches.
+        """
+        generator = self.get(model_name, backend, **settings)
+        if generator is None:
+            return None
+
+        key = (id(generator), max_batch_size, max_wait_ms)
+        with self._lock:
+            if key not in self._batching:
+                self._batching[key] = BatchingGenerator(generator, max_batch_size, max_wait_ms)
+            return self._batching[key]
+
+    def _load(self, model_name: str, backend: str, settings: Dict[str, Any]) -> Optional[SharedGenerator]:
+        """Load the tokenizer, model and pipeline for model_name on backend"""
+        try:
+            generator = load_pipeline(backend, model_name, settings)
+            logger.info("Model %s (%s) loaded successfully", model_name, backend)
+            return SharedGenerator(generator, model_name)
+        except Exception:
+            logger.exception("Error loading model %s (%s)", model_name, backend)
+            return None
+
+    def warm_up(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND,
+                **settings) -> bool:
+        """Load the model and run one tiny generation so the first request is fast"""
+        generator = self.get(model_name, backend, **settings)
+        if not generator:
+            return False
+
+        try:
+            generator("Warm up.", max_length=8)
+        except Exception:
+            logger.exception("Error warming up model %s (%s)", model_name, backend)
+        return True
+
+    def clear(self):
+        """Drop all loaded models (and cached load failures)"""
+        with self._lock:
+            for batching in self._batching.values():
+                batching.close()
+            self._batching.clear()
+            self._entries.clear()
+            self._key_locks.clear()
+
+
+registry = ModelRegistry()
+
+
+def get_generator(model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND,
+                  **settings) -> Optional[SharedGenerator]:
+    """Return the process-wide generator for model_name from the default registry"""
+    return registry.get(model_name, backend, **settings)
+
+
+def get_batching_generator(model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND,
+                           max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                           **settings) -> Optional[BatchingGenerator]:
+    """Return the process-wide request-batching generator for model_name"""
+    return registry.get_batching(model_name, backend, max_batch_size, max_wait_ms, **settings)
+
+
+def warm_up(model_name: str = DEFAULT_MODEL_NAME, backend: str = DEFAULT_BACKEND, **settings) -> bool:
+    """Preload a model in the default registry"""
+    return registry.warm_up(model_name, backend, **settings)
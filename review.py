@@ -0,0 +1,163 @@
+"""
+Flashcard Generator - Spaced Repetition
+SM-2 review scheduling over a SQLite card store indexed on due time
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from flashcard_cache import make_cache_key
+from sqlite_store import SQLiteStore
+
+
+DAY_SECONDS = 24 * 3600
+# SM-2 parameters: new cards start at DEFAULT_EASE, and the ease factor never
+# drops below MIN_EASE; the first two successful reviews are FIRST_INTERVAL
+# and SECOND_INTERVAL days apart, later ones interval * ease
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+# Grades run from 0 (blackout) to 5 (perfect recall); below PASSING_GRADE the card is relearned
+MAX_GRADE = 5
+PASSING_GRADE = 3
+
+DEFAULT_DUE_LIMIT = 20
+MAX_DUE_LIMIT = 1000
+
+STATE_FIELDS = ("ease", "interval", "repetitions", "lapses", "due_at", "last_reviewed_at")
+
+
+def sm2(state: Dict[str, Any], grade: int, now: Optional[float] = None) -> Dict[str, Any]:
+    """Return a card's review state after a review graded 0-5 (SuperMemo 2)
+
+    state holds "ease", "interval" (days), "repetitions" and "lapses"; the
+    result also has the new "due_at" and "last_reviewed_at" times.
+    """
+    if not 0 <= grade <= MAX_GRADE:
+        raise ValueError(f"grade must be between 0 and {MAX_GRADE}")
+    now = time.time() if now is None else now
+
+    ease, repetitions, lapses = state["ease"], state["repetitions"], state["lapses"]
+    if grade < PASSING_GRADE:
+        # A failed recall restarts the repetitions but, as in SM-2, keeps the ease
+        repetitions, interval = 0, FIRST_INTERVAL
+        lapses += 1 if state["repetitions"] else 0
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = FIRST_INTERVAL
+        elif repetitions == 2:
+            interval = SECOND_INTERVAL
+        else:
+            interval = round(state["interval"] * ease)
+
+        miss = MAX_GRADE - grade
+        ease = max(MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+
+    return {"ease": round(ease, 4), "interval": interval, "repetitions": repetitions, "lapses": lapses,
+            "due_at": now + interval * DAY_SECONDS, "last_reviewed_at": now}
+
+
+def card_fingerprint(card: Dict[str, Any]) -> str:
+    """Identify a card by its question and answer, so re-importing a deck doesn't duplicate it"""
+    return make_cache_key({"question": card["question"], "answer": card["answer"]})
+
+
+class ReviewStore(SQLiteStore):
+    """Cards under review, per user, in SQLite
+
+    Each card row carries its SM-2 state and the time it is next due. An
+    index on (user_id, due_at) turns "the next N due cards of a user" into
+    an index range scan, so it costs O(log n + N) however many cards are
+    stored. Imports are written with one executemany in a single
+    transaction, and cards a user already has (same question and answer)
+    are skipped by a unique index rather than a lookup per card.
+
+    With path=":memory:" the store lives in this process only.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS review_cards ("
+        "id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+        "deck TEXT, card TEXT NOT NULL, "
+        f"ease REAL NOT NULL DEFAULT {DEFAULT_EASE}, interval INTEGER NOT NULL DEFAULT 0, "
+        "repetitions INTEGER NOT NULL DEFAULT 0, lapses INTEGER NOT NULL DEFAULT 0, "
+        "due_at REAL NOT NULL, last_reviewed_at REAL, created_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS review_cards_due ON review_cards (user_id, due_at)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS review_cards_fingerprint ON review_cards (user_id, fingerprint)",
+    )
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__(path)
+
+    def add_cards(self, user_id: str, cards: Iterable[Dict[str, Any]], deck: Optional[str] = None,
+                  now: Optional[float] = None) -> int:
+        """Add cards (dicts with at least a question and an answer) for review, due now
+
+        Returns how many were added; cards the user already has are skipped.
+        """
+        now = time.time() if now is None else now
+        rows = [
+            (user_id, card_fingerprint(card), deck,
+             json.dumps({key: value for key, value in card.items() if key not in ("id", "review")}), now, now)
+            for card in cards
+        ]
+        if not rows:
+            return 0
+
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO review_cards (user_id, fingerprint, deck, card, due_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._conn.total_changes - before
+
+    def due(self, user_id: str, limit: int = DEFAULT_DUE_LIMIT, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return up to limit of the user's cards due by now, most overdue first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, card, " + ", ".join(STATE_FIELDS) + " FROM review_cards "
+                "WHERE user_id = ? AND due_at <= ? ORDER BY due_at, id LIMIT ?",
+                (user_id, now, limit)
+            ).fetchall()
+        return [self._row_to_card(row) for row in rows]
+
+    def review(self, user_id: str, card_id: int, grade: int, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Record a review graded 0-5 and reschedule the card
+
+        Returns the card with its new state, or None if the user has no such card.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, card, " + ", ".join(STATE_FIELDS) + " FROM review_cards WHERE id = ? AND user_id = ?",
+                (card_id, user_id)
+            ).fetchone()
+            if row is None:
+                return None
+
+            card = self._row_to_card(row)
+            state = sm2(card["review"], grade, now)
+            self._conn.execute(
+                "UPDATE review_cards SET " + ", ".join(f"{field} = ?" for field in STATE_FIELDS) + " WHERE id = ?",
+                [state[field] for field in STATE_FIELDS] + [card_id]
+            )
+        card["review"] = state
+        return card
+
+    def delete(self, user_id: str, card_id: int) -> bool:
+        """Stop reviewing a card; returns False if the user has no such card"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM review_cards WHERE id = ? AND user_id = ?", (card_id, user_id))
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def _row_to_card(row) -> Dict[str, Any]:
+        card = json.loads(row[1])
+        card["id"] = row[0]
+        card["review"] = dict(zip(STATE_FIELDS, row[2:]))
+        return card
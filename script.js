@@ -1,5 +1,6 @@
 
 let currentFlashcards = [];
+let currentDeckId = null;
 
 // Tab switching functionality
 function switchTab(tabName) {
@@ -62,19 +63,45 @@ document.getElementById('flashcard-form').addEventListener('submit', async (e) =
             formData.append('file', fileInput.files[0]);
         }
         
-        const response = await fetch('/generate_flashcards', {
+        const response = await fetch('/generate_flashcards/stream', {
             method: 'POST',
             body: formData
         });
         
-        const data = await response.json();
-        
         if (!response.ok) {
+            const data = await response.json();
             throw new Error(data.error || 'Failed to generate flashcards');
         }
         
-        currentFlashcards = data;
-        displayFlashcards(data);
+        // Render each card as soon as its line of NDJSON arrives
+        resetFlashcards();
+        currentDeckId = response.headers.get('X-Deck-Id');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            
+            const lines = buffer.split('\n');
+            buffer = done ? '' : lines.pop();
+            
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const card = JSON.parse(line);
+                if (card.error) {
+                    throw new Error(card.error);
+                }
+                addFlashcard(card);
+            }
+            
+            if (done) break;
+        }
+        
+        if (!currentFlashcards.length) {
+            throw new Error('Could not generate flashcards from the provided content');
+        }
         
     } catch (error) {
         console.error('Error:', error);
@@ -88,42 +115,13 @@ document.getElementById('flashcard-form').addEventListener('submit', async (e) =
     }
 });
 
-// Display flashcards
-function displayFlashcards(flashcards) {
+// Clear previous output and show the (empty) flashcards section
+function resetFlashcards() {
     const section = document.getElementById('flashcards-section');
-    const statsDiv = document.getElementById('flashcards-stats');
-    const outputDiv = document.getElementById('flashcards-output');
     
-    // Show stats
-    statsDiv.innerHTML = `
-        <h3>📊 Generation Summary</h3>
-        <p><strong>${flashcards.length}</strong> flashcards generated successfully!</p>
-    `;
-    
-    // Clear previous output
-    outputDiv.innerHTML = '';
-    
-    // Create flashcard elements
-    flashcards.forEach((card, index) => {
-        const cardDiv = document.createElement('div');
-        cardDiv.classList.add('flashcard');
-        
-        const difficultyClass = `difficulty-${card.difficulty.toLowerCase()}`;
-        
-        cardDiv.innerHTML = `
-            <div class="topic-tag">${card.topic || 'General'}</div>
-            <div class="flashcard-header">
-                <span class="flashcard-number">Card ${index + 1}</span>
-                <span class="difficulty-badge ${difficultyClass}">${card.difficulty}</span>
-            </div>
-            <h3>❓ ${card.question}</h3>
-            <div class="flashcard-answer">
-                <strong>💡 Answer:</strong> ${card.answer}
-            </div>
-        `;
-        
-        outputDiv.appendChild(cardDiv);
-    });
+    currentFlashcards = [];
+    document.getElementById('flashcards-output').innerHTML = '';
+    updateFlashcardStats();
     
     // Show the section
     section.style.display = 'block';
@@ -132,15 +130,50 @@ function displayFlashcards(flashcards) {
     section.scrollIntoView({ behavior: 'smooth' });
 }
 
+// Show stats
+function updateFlashcardStats() {
+    document.getElementById('flashcards-stats').innerHTML = `
+        <h3>📊 Generation Summary</h3>
+        <p><strong>${currentFlashcards.length}</strong> flashcards generated successfully!</p>
+    `;
+}
+
+// Append a single flashcard element
+function addFlashcard(card) {
+    const outputDiv = document.getElementById('flashcards-output');
+    const index = currentFlashcards.length;
+    currentFlashcards.push(card);
+    
+    const cardDiv = document.createElement('div');
+    cardDiv.classList.add('flashcard');
+    
+    const difficultyClass = `difficulty-${card.difficulty.toLowerCase()}`;
+    
+    cardDiv.innerHTML = `
+        <div class="topic-tag">${card.topic || 'General'}</div>
+        <div class="flashcard-header">
+            <span class="flashcard-number">Card ${index + 1}</span>
+            <span class="difficulty-badge ${difficultyClass}">${card.difficulty}</span>
+        </div>
+        <h3>❓ ${card.question}</h3>
+        <div class="flashcard-answer">
+            <strong>💡 Answer:</strong> ${card.answer}
+        </div>
+    `;
+    
+    outputDiv.appendChild(cardDiv);
+    updateFlashcardStats();
+}
+
 // Export functionality
 function exportFlashcards(format) {
-    if (!currentFlashcards.length) {
+    if (!currentFlashcards.length || !currentDeckId) {
         alert('No flashcards to export!');
         return;
     }
     
-    const dataParam = encodeURIComponent(JSON.stringify(currentFlashcards));
-    const url = `/export/${format}?data=${dataParam}`;
+    // The deck is stored server-side, so only its id goes in the URL
+    const url = `/export/${format}/${encodeURIComponent(currentDeckId)}`;
     
     // Create temporary link and trigger download
     const link = document.createElement('a');
@@ -0,0 +1,143 @@
+"""
+Flashcard Generator - Chunk Selection
+Cheap TF-IDF scoring to pick diverse, representative chunks and drop duplicate questions
+"""
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r'[a-z][a-z0-9]+')
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our out over own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who whom why will with
+would you your
+""".split())
+
+N_FEATURES = 1024
+# Chunks (or questions) at least this cosine-similar to one already picked are duplicates
+DUPLICATE_THRESHOLD = 0.9
+QUESTION_DUPLICATE_THRESHOLD = 0.85
+# Coverage is measured against at most MAX_GROUND chunks and picked from at
+# most MAX_CANDIDATES, both evenly spaced through the document
+MAX_GROUND = 1000
+MAX_CANDIDATES = 5000
+
+
+def term_counts(texts: List[str], n_features: int = N_FEATURES) -> np.ndarray:
+    """Hashed term-count matrix (one row per text) of the non-stopword words
+
+    Words are hashed with crc32 rather than hash() so vectors, and therefore
+    selections, are the same in every process.
+    """
+    columns = {}
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for word in WORD_PATTERN.findall(text.lower()):
+            if word in STOPWORDS:
+                continue
+            col = columns.get(word)
+            if col is None:
+                col = columns[word] = zlib.crc32(word.encode()) % n_features
+            rows.append(row)
+            cols.append(col)
+
+    counts = np.zeros((len(texts), n_features), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1)
+    return counts
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (all-zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def tfidf_vectors(texts: List[str], n_features: int = N_FEATURES) -> np.ndarray:
+    """Unit-length TF-IDF vectors (sublinear term frequency, smoothed IDF)"""
+    counts = term_counts(texts, n_features)
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    return normalize_rows(np.log1p(counts) * idf.astype(np.float32))
+
+
+def _spread(n: int, limit: int) -> np.ndarray:
+    """Up to limit indices evenly spaced over range(n)"""
+    if n <= limit:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, limit).astype(np.intp))
+
+
+def select_representative(texts: List[str], k: int, duplicate_threshold: float = DUPLICATE_THRESHOLD,
+                          max_ground: int = MAX_GROUND, max_candidates: int = MAX_CANDIDATES) -> List[int]:
+    """Pick the indices of up to k texts that together cover the whole collection
+
+    Greedy facility location over TF-IDF cosine similarity: each step picks
+    the text that most increases how well every text is represented by its
+    closest pick, so picks spread over all the distinct material instead of
+    the opening pages. Texts at least duplicate_threshold similar to a pick are
+    never picked. Indices are returned in document order.
+    """
+    if k <= 0 or not texts:
+        return []
+
+    vectors = tfidf_vectors(texts)
+    candidates = _spread(len(texts), max_candidates)
+    candidate_vectors = vectors[candidates]
+    # similarity[g, c]: how well candidate c represents ground text g
+    similarity = vectors[_spread(len(texts), max_ground)] @ candidate_vectors.T
+
+    coverage = np.zeros(similarity.shape[0], dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    picked = []
+
+    while len(picked) < k and available.any():
+        gains = np.maximum(similarity - coverage[:, None], 0).sum(axis=0)
+        gains[~available] = -1
+        best = int(np.argmax(gains))
+        picked.append(int(candidates[best]))
+
+        coverage = np.maximum(coverage, similarity[:, best])
+        available &= candidate_vectors @ candidate_vectors[best] < duplicate_threshold
+        available[best] = False
+
+    return sorted(picked)
+
+
+class QuestionDeduplicator:
+    """Remembers questions and flags new ones that nearly repeat an earlier one"""
+
+    def __init__(self, threshold: float = QUESTION_DUPLICATE_THRESHOLD, n_features: int = N_FEATURES):
+        self.threshold = threshold
+        self.n_features = n_features
+        self._vectors = np.zeros((0, n_features), dtype=np.float32)
+        self._exact = set()
+
+    def _vectorize(self, question: str):
+        normalized = " ".join(WORD_PATTERN.findall(question.lower()))
+        return normalized, normalize_rows(term_counts([question], self.n_features))
+
+    def _matches(self, normalized: str, vector: np.ndarray) -> bool:
+        if normalized in self._exact:
+            return True
+        return bool(len(self._vectors) and vector.any() and (self._vectors @ vector[0]).max() >= self.threshold)
+
+    def is_duplicate(self, question: str) -> bool:
+        """Return True if question duplicates an earlier one, without remembering it"""
+        return self._matches(*self._vectorize(question))
+
+    def seen(self, question: str) -> bool:
+        """Return True if question duplicates an earlier one; otherwise remember it"""
+        normalized, vector = self._vectorize(question)
+        if self._matches(normalized, vector):
+            return True
+
+        self._exact.add(normalized)
+        self._vectors = np.vstack([self._vectors, vector])
+        return False
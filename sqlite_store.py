@@ -0,0 +1,70 @@
+"""
+Flashcard Generator - SQLite Stores
+Connection handling shared by the caches and stores kept in SQLite
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+
+# How long a write waits for another process's write to finish
+BUSY_TIMEOUT_MS = 30000
+
+
+class Reconnectable:
+    """Base for stores that app.init_worker reopens in every forked worker
+
+    Stores held in memory have nothing to reopen; SQLiteStore overrides this.
+    """
+
+    def reconnect(self):
+        """Reopen any database connection in a newly forked process (nothing to do in memory)"""
+
+
+class SQLiteStore(Reconnectable):
+    """Base for stores kept in one SQLite database file
+
+    Opens the database (creating its directory), runs the SCHEMA statements,
+    and serializes use of the single connection, which is shared by all the
+    threads of a process, on self._lock. path=":memory:" keeps the database
+    in this process only.
+    """
+
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        with self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            # Worker processes share the file: WAL lets them read while another
+            # one writes, and writers wait for each other instead of failing
+            # with "database is locked"
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def reconnect(self):
+        """Open a fresh connection, e.g. in a worker forked after the store was created
+
+        SQLite connections must not be used across fork. The inherited one is
+        left open, since closing it could disturb the parent's. An in-memory
+        database has no file to reopen and keeps its connection.
+        """
+        if self.path == ":memory:":
+            return
+        self._lock = threading.Lock()
+        self._conn = self._connect()
@@ -0,0 +1,96 @@
+"""
+Tests for request batching across concurrent callers
+"""
+
+import threading
+
+import pytest
+
+from batching import BatchingGenerator
+
+
+class EchoGenerator:
+    """Pipeline stand-in that records its batches and echoes each prompt"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, prompts, batch_size=None, **kwargs):
+        self.batches.append(list(prompts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [{"generated_text": f"{prompt} {kwargs.get('max_length')}"} for prompt in prompts]
+
+
+def call_concurrently(batcher, calls):
+    """Run batcher(prompts, **kwargs) for every (prompts, kwargs) at once; return results or errors"""
+    outcomes = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def run(i, prompts, kwargs):
+        barrier.wait()
+        try:
+            outcomes[i] = batcher(prompts, **kwargs)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, prompts, kwargs))
+               for i, (prompts, kwargs) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def test_concurrent_callers_share_batches_and_get_their_own_results():
+    generator = EchoGenerator()
+    batcher = BatchingGenerator(generator, max_batch_size=12, max_wait_ms=1000)
+    calls = [([f"c{i} p{j}" for j in range(3)], {"max_length": 8}) for i in range(4)]
+
+    outcomes = call_concurrently(batcher, calls)
+    batcher.close()
+
+    for i, results in enumerate(outcomes):
+        assert [r["generated_text"] for r in results] == [f"c{i} p{j} 8" for j in range(3)]
+    assert generator.batches and len(generator.batches) < len(calls)
+    assert sorted(p for batch in generator.batches for p in batch) == sorted(p for ps, _ in calls for p in ps)
+
+
+def test_calls_with_different_arguments_are_batched_apart():
+    generator = EchoGenerator()
+    batcher = BatchingGenerator(generator, max_batch_size=4, max_wait_ms=20)
+
+    outcomes = call_concurrently(batcher, [(["a", "b"], {"max_length": 8}), (["c", "d"], {"max_length": 16})])
+    batcher.close()
+
+    assert [r["generated_text"] for r in outcomes[0]] == ["a 8", "b 8"]
+    assert [r["generated_text"] for r in outcomes[1]] == ["c 16", "d 16"]
+    assert sorted(map(sorted, generator.batches)) == [["a", "b"], ["c", "d"]]
+
+
+def test_single_prompt_returns_a_single_result():
+    batcher = BatchingGenerator(EchoGenerator(), max_wait_ms=0)
+
+    assert batcher("only", max_length=4) == {"generated_text": "only 4"}
+    batcher.close()
+
+
+def test_error_reaches_every_caller_of_the_failed_batch():
+    generator = EchoGenerator(fail=True)
+    batcher = BatchingGenerator(generator, max_batch_size=6, max_wait_ms=1000)
+
+    outcomes = call_concurrently(batcher, [([f"c{i} p{j}" for j in range(2)], {}) for i in range(3)])
+    batcher.close()
+
+    assert len(generator.batches) == 1
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+
+def test_closed_batcher_rejects_new_prompts():
+    batcher = BatchingGenerator(EchoGenerator())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher(["late"])
@@ -0,0 +1,37 @@
+"""
+Tests for the token-aware chunker
+"""
+
+import pytest
+
+from chunking import TokenChunker, approximate_token_counts
+from sample_content import BIOLOGY_SAMPLE, COMPUTER_SCIENCE_SAMPLE, HISTORY_SAMPLE
+
+
+TEXT = "\n\n".join([BIOLOGY_SAMPLE, HISTORY_SAMPLE, COMPUTER_SCIENCE_SAMPLE])
+
+
+def pieces_of(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("max_tokens, overlap_tokens", [(20, 0), (60, 0), (60, 15)])
+@pytest.mark.parametrize("piece_size", [1, 7, 100, 1000])
+def test_streamed_pieces_give_the_same_chunks_as_whole_text(max_tokens, overlap_tokens, piece_size):
+    chunker = TokenChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+    assert list(chunker.iter_chunks(pieces_of(TEXT, piece_size))) == chunker.split(TEXT)
+
+
+@pytest.mark.parametrize("max_tokens", [5, 20, 60])
+def test_every_chunk_fits_max_tokens(max_tokens):
+    chunks = TokenChunker(max_tokens=max_tokens, overlap_tokens=max_tokens // 4).split(TEXT)
+
+    assert len(chunks) > 1
+    assert max(approximate_token_counts(chunks)) <= max_tokens
+
+
+def test_chunks_cover_the_text_in_order():
+    chunks = TokenChunker(max_tokens=40).split(TEXT)
+
+    assert " ".join(chunks).split() == TEXT.split()
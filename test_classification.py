@@ -0,0 +1,45 @@
+"""
+Tests for batched card classification
+"""
+
+import pytest
+
+from classification import CardClassifier, _inflections
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return CardClassifier.from_file()
+
+
+def classify_one(classifier, text):
+    return classifier.classify([text], ["q"], ["a"])[0]
+
+
+@pytest.mark.parametrize("text", [
+    "The results were based on basic ideas that everyone shares about things.",
+    "The night nurse walked slowly along the ward toward the stairs and the lifts.",
+])
+def test_common_words_are_not_read_as_keywords(classifier, text):
+    assert classify_one(classifier, text)[1] == "Section 1"
+
+
+@pytest.mark.parametrize("text, topic", [
+    ("Several experiments were repeated in the laboratory.", "Science"),
+    ("The wars weakened the empire.", "History"),
+    ("Atomic nuclei hold most of the atom.", "Chemistry"),
+])
+def test_keywords_and_listed_variants_match(classifier, text, topic):
+    assert classify_one(classifier, text)[1] == topic
+
+
+def test_inflections_skip_word_forming_endings():
+    assert "based" not in _inflections("base")
+    assert "basic" not in _inflections("base")
+    assert "ward" not in _inflections("war")
+    assert {"wars", "experiments", "experimented"} <= set(_inflections("war") + _inflections("experiment"))
+
+
+def test_unmatched_cards_are_numbered_by_index(classifier):
+    results = classifier.classify(["plain words", "more plain words"], ["q", "q"], ["a", "a"], indices=[4, 9])
+    assert [topic for _, topic in results] == ["Section 5", "Section 10"]
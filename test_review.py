@@ -0,0 +1,88 @@
+"""
+Tests for SM-2 review scheduling and the review card store
+"""
+
+import pytest
+
+from review import DAY_SECONDS, DEFAULT_EASE, MIN_EASE, ReviewStore, sm2
+
+
+NEW_CARD = {"ease": DEFAULT_EASE, "interval": 0, "repetitions": 0, "lapses": 0}
+
+
+def review_all(grades, state=NEW_CARD):
+    for grade in grades:
+        state = sm2(state, grade, now=0)
+    return state
+
+
+def card(i):
+    return {"question": f"Question {i}?", "answer": f"Answer {i}"}
+
+
+@pytest.fixture
+def store():
+    return ReviewStore(":memory:")
+
+
+def test_passing_reviews_grow_the_interval():
+    intervals = []
+    state = NEW_CARD
+    for _ in range(4):
+        state = sm2(state, 5, now=0)
+        intervals.append(state["interval"])
+
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] == round(6 * (DEFAULT_EASE + 0.2))
+    assert state["due_at"] == state["interval"] * DAY_SECONDS
+    assert state["repetitions"] == 4
+
+
+def test_ease_follows_the_grade_of_passing_reviews():
+    assert sm2(NEW_CARD, 5, now=0)["ease"] == pytest.approx(DEFAULT_EASE + 0.1)
+    assert sm2(NEW_CARD, 4, now=0)["ease"] == pytest.approx(DEFAULT_EASE)
+    assert sm2(NEW_CARD, 3, now=0)["ease"] == pytest.approx(DEFAULT_EASE - 0.14)
+    assert review_all([3] * 20)["ease"] == MIN_EASE
+
+
+def test_failed_review_relearns_the_card_and_keeps_its_ease():
+    learned = review_all([5, 5, 4])
+    failed = sm2(learned, 1, now=0)
+
+    assert failed["ease"] == learned["ease"]
+    assert (failed["repetitions"], failed["interval"], failed["lapses"]) == (0, 1, 1)
+
+
+def test_invalid_grade_is_rejected():
+    with pytest.raises(ValueError):
+        sm2(NEW_CARD, 6)
+
+
+def test_due_cards_come_most_overdue_first_up_to_limit(store):
+    store.add_cards("ann", [card(i) for i in range(3)], now=100)
+    store.add_cards("ann", [card(3)], now=50)
+    store.add_cards("bob", [card(9)], now=0)
+
+    due = store.due("ann", limit=10, now=200)
+    assert [c["question"] for c in due] == ["Question 3?", "Question 0?", "Question 1?", "Question 2?"]
+    assert len(store.due("ann", limit=2, now=200)) == 2
+    assert store.due("ann", now=75)[0]["question"] == "Question 3?"
+    assert len(store.due("ann", now=75)) == 1
+
+
+def test_reviewed_card_is_no_longer_due(store):
+    store.add_cards("ann", [card(0), card(1)], now=0)
+    first = store.due("ann", now=0)[0]
+
+    reviewed = store.review("ann", first["id"], 5, now=0)
+    assert reviewed["review"]["interval"] == 1
+    assert first["id"] not in [c["id"] for c in store.due("ann", now=0)]
+    assert first["id"] in [c["id"] for c in store.due("ann", now=DAY_SECONDS)]
+    assert store.review("bob", first["id"], 5) is None
+
+
+def test_bulk_import_skips_cards_the_user_already_has(store):
+    assert store.add_cards("ann", [card(0), card(1), card(0)]) == 2
+    assert store.add_cards("ann", [card(1), card(2)]) == 1
+    assert store.add_cards("bob", [card(0)]) == 1
+    assert len(store.due("ann", limit=10)) == 3